@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import Link from 'next/link';
-import { getIPFSGatewayURL } from '@/lib/ipfs';
+import { getEventImageUrl } from '@/lib/api';
 
 interface EventCardProps {
   event: {
@@ -19,7 +19,7 @@ interface EventCardProps {
 export default function EventCard({ event }: EventCardProps) {
   const availability = event.total_supply - event.sold_count;
   const percentageSold = (event.sold_count / event.total_supply) * 100;
-  const imageUrl = getIPFSGatewayURL(event.image_url);
+  const imageUrl = event.image_url ? getEventImageUrl(event._id, 640) : '';
   const [imageError, setImageError] = useState(false);
 
   return (
@@ -28,6 +28,8 @@ export default function EventCard({ event }: EventCardProps) {
         {imageUrl && !imageError ? (
           <img
             src={imageUrl}
+            srcSet={`${getEventImageUrl(event._id, 320)} 320w, ${imageUrl} 640w`}
+            sizes="(max-width: 640px) 100vw, 400px"
             alt={event.title}
             className="w-full h-full object-cover"
             onError={() => setImageError(true)}
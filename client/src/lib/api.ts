@@ -11,6 +11,10 @@ export const api = axios.create({
   },
 });
 
+// Event image resized on the server to the width it is displayed at
+export const getEventImageUrl = (eventId: string, width: number) =>
+  `${API_BASE_URL}/events/${eventId}/image?w=${width}`;
+
 export const walletLogin = async (walletAddress: string, signature: string, message: string) => {
   const response = await api.post('/auth/wallet', {
     wallet_address: walletAddress,
@@ -20,9 +24,19 @@ export const walletLogin = async (walletAddress: string, signature: string, mess
   return response.data;
 };
 
+// Largest page GET /events serves
+const EVENTS_PAGE_SIZE = 500;
+
 export const getEvents = async () => {
-  const response = await api.get('/events');
-  return response.data;
+  // Event lists are paged; follow X-Next-Cursor until the last page
+  const events: any[] = [];
+  let after: string | undefined;
+  do {
+    const response = await api.get('/events', { params: { limit: EVENTS_PAGE_SIZE, after } });
+    events.push(...response.data);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return events;
 };
 
 export const getEvent = async (eventId: string) => {
@@ -39,13 +53,41 @@ export const createEvent = async (formData: FormData) => {
   return response.data;
 };
 
-export const mintTicket = async (formData: FormData) => {
+export const getMintOrder = async (orderId: string) => {
+  const response = await api.get(`/tickets/orders/${orderId}`);
+  return response.data;
+};
+
+// How long mintTicket waits for an order to settle before giving up on it
+const MINT_ORDER_TIMEOUT_MS = 5 * 60 * 1000;
+const MINT_ORDER_POLL_MS = 2000;
+
+// The order settled as failed, so retrying with the same key cannot succeed
+export class MintOrderFailed extends Error {}
+
+// Minting runs as a background order: submit it, then poll until it settles.
+// Generate idempotencyKey once per purchase and pass the same key when
+// retrying, so a retry after a network error does not buy a second ticket.
+export const mintTicket = async (formData: FormData, idempotencyKey: string) => {
   const response = await api.post('/tickets/mint', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
+      'Idempotency-Key': idempotencyKey,
     },
   });
-  return response.data;
+  let order = response.data;
+  const deadline = Date.now() + MINT_ORDER_TIMEOUT_MS;
+  while (order.status !== 'completed' && order.status !== 'failed') {
+    if (Date.now() >= deadline) {
+      throw new Error('Your ticket is still being minted. Check your dashboard in a few minutes.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, MINT_ORDER_POLL_MS));
+    order = await getMintOrder(order.order_id);
+  }
+  if (order.status === 'failed') {
+    throw new MintOrderFailed(order.error || 'Minting failed');
+  }
+  return order;
 };
 
 export const getUserTickets = async (walletAddress: string) => {
@@ -62,6 +104,89 @@ export const verifyTicket = async (formData: FormData) => {
   return response.data;
 };
 
+// Next.js rewrites only proxy HTTP, so the verification socket goes to the server directly
+const WS_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/^http/, 'ws');
+
+type PendingVerification = {
+  resolve: (verdict: any) => void;
+  reject: (error: Error) => void;
+  onStage?: (stage: string) => void;
+};
+
+// Verification channel kept open across scans (/verify/ws). Replies are
+// matched to scans by id, so scans may overlap; the socket is reopened on
+// the next scan if it drops.
+export class VerifySocket {
+  private socket: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private nextId = 1;
+  private pending = new Map<number, PendingVerification>();
+
+  constructor(private gateId: string = 'default') {}
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      return Promise.resolve(this.socket);
+    }
+    if (!this.opening) {
+      this.opening = new Promise((resolve, reject) => {
+        const socket = new WebSocket(`${WS_BASE_URL}/verify/ws?gate_id=${encodeURIComponent(this.gateId)}`);
+        socket.onopen = () => {
+          this.socket = socket;
+          this.opening = null;
+          resolve(socket);
+        };
+        socket.onerror = () => {
+          this.opening = null;
+          reject(new Error('Could not connect to the verification server'));
+        };
+        socket.onmessage = (event) => this.handle(JSON.parse(event.data));
+        socket.onclose = () => {
+          this.socket = null;
+          this.pending.forEach(({ reject }) => reject(new Error('Verification connection closed')));
+          this.pending.clear();
+        };
+      });
+    }
+    return this.opening;
+  }
+
+  private handle(message: any) {
+    if (message.type === 'error') {
+      console.error('Verification socket error:', message.message);
+      return;
+    }
+    const request = this.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+    if (message.type === 'stage') {
+      request.onStage?.(message.stage);
+    } else if (message.type === 'verdict') {
+      this.pending.delete(message.id);
+      const { type, id, ...verdict } = message;
+      request.resolve(verdict);
+    }
+  }
+
+  async verify(qrData: string, selfie: Blob, onStage?: (stage: string) => void): Promise<any> {
+    // Read the photo first: its binary frame must directly follow its qr_data frame
+    const selfieBytes = await selfie.arrayBuffer();
+    const socket = await this.connect();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject, onStage });
+      socket.send(JSON.stringify({ id, qr_data: qrData }));
+      socket.send(selfieBytes);
+    });
+  }
+
+  close() {
+    this.socket?.close();
+    this.socket = null;
+  }
+}
+
 export const getVerificationLogs = async () => {
   const response = await api.get('/verify/logs');
   return response.data;
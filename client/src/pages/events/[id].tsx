@@ -1,7 +1,6 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useRouter } from 'next/router';
-import { getEvent, mintTicket } from '@/lib/api';
-import { getIPFSGatewayURL } from '@/lib/ipfs';
+import { getEvent, getEventImageUrl, mintTicket, MintOrderFailed } from '@/lib/api';
 
 export default function EventDetail() {
   const router = useRouter();
@@ -11,6 +10,8 @@ export default function EventDetail() {
   const [minting, setMinting] = useState(false);
   const [selectedImage, setSelectedImage] = useState<File | null>(null);
   const [imageError, setImageError] = useState(false);
+  // Idempotency key of the purchase in progress, reused by retries until it settles
+  const purchaseKey = useRef<string | null>(null);
 
   useEffect(() => {
     if (id) {
@@ -54,11 +55,19 @@ export default function EventDetail() {
       formData.append('wallet_address', walletAddress);
       formData.append('buyer_image', selectedImage);
 
-      const result = await mintTicket(formData);
+      if (!purchaseKey.current) {
+        purchaseKey.current = crypto.randomUUID();
+      }
+      const result = await mintTicket(formData, purchaseKey.current);
+      purchaseKey.current = null;
       alert(`Ticket minted successfully! Token ID: ${result.token_id}`);
       router.push('/dashboard');
     } catch (error: any) {
       console.error('Error minting ticket:', error);
+      if (error instanceof MintOrderFailed || error.response?.status < 500) {
+        // Settled or rejected; the next attempt is a new purchase
+        purchaseKey.current = null;
+      }
       alert(`Failed to mint ticket: ${error.response?.data?.detail || error.message}`);
     } finally {
       setMinting(false);
@@ -83,7 +92,7 @@ export default function EventDetail() {
 
   const availability = event.total_supply - event.sold_count;
 
-  const imageUrl = event ? getIPFSGatewayURL(event.image_url) : '';
+  const imageUrl = event?.image_url ? getEventImageUrl(event._id, 1280) : '';
 
   return (
     <div className="min-h-screen bg-gray-50 py-12">
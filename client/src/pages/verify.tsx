@@ -1,6 +1,6 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import dynamic from 'next/dynamic';
-import { verifyTicket } from '@/lib/api';
+import { VerifySocket } from '@/lib/api';
 
 const QRScanner = dynamic(() => import('@/components/QRScanner'), { ssr: false });
 const CameraCapture = dynamic(() => import('@/components/CameraCapture'), { ssr: false });
@@ -12,6 +12,14 @@ export default function Verify() {
   const [result, setResult] = useState<any>(null);
   const [scanMode, setScanMode] = useState(true);
   const [cameraMode, setCameraMode] = useState(true);
+  const [stage, setStage] = useState<string | null>(null);
+  // One verification connection for the whole session at the gate
+  const verifySocket = useRef<VerifySocket | null>(null);
+
+  useEffect(() => {
+    verifySocket.current = new VerifySocket();
+    return () => verifySocket.current?.close();
+  }, []);
 
   const handleQRScan = (data: string) => {
     setQrData(data);
@@ -44,28 +52,27 @@ export default function Verify() {
       return;
     }
 
-    // Validate QR data format
-    try {
-      const qrJson = JSON.parse(qrData);
-      if (!qrJson.token_id || !qrJson.metadata_uri) {
-        alert('Invalid QR code data. Please make sure you scanned the correct QR code from your ticket.');
+    // Validate QR data format; signed credentials are checked by the server
+    if (!qrData.startsWith('TK1:')) {
+      try {
+        const qrJson = JSON.parse(qrData);
+        if (!qrJson.token_id || !qrJson.metadata_uri) {
+          alert('Invalid QR code data. Please make sure you scanned the correct QR code from your ticket.');
+          return;
+        }
+      } catch (e) {
+        alert('Invalid QR code format. The QR code should contain JSON data. Please check your ticket QR code.');
         return;
       }
-    } catch (e) {
-      alert('Invalid QR code format. The QR code should contain JSON data. Please check your ticket QR code.');
-      return;
     }
 
     setVerifying(true);
     setResult(null);
+    setStage(null);
 
     try {
-      const formData = new FormData();
-      formData.append('qr_data', qrData);
-      formData.append('selfie', selfie);
-
       console.log('Verifying ticket with QR data:', qrData.substring(0, 100) + '...');
-      const verificationResult = await verifyTicket(formData);
+      const verificationResult = await verifySocket.current!.verify(qrData, selfie, setStage);
       console.log('Verification result:', verificationResult);
       setResult(verificationResult);
     } catch (error: any) {
@@ -79,6 +86,19 @@ export default function Verify() {
       alert(`Verification failed: ${errorMessage}`);
     } finally {
       setVerifying(false);
+      setStage(null);
+    }
+  };
+
+  const getStageLabel = (current: string | null) => {
+    switch (current) {
+      case 'precheck_passed':
+        return 'Fetching ticket photo...';
+      case 'fetched':
+      case 'provider_pending':
+        return 'Comparing faces...';
+      default:
+        return 'Verifying...';
     }
   };
 
@@ -89,6 +109,7 @@ export default function Verify() {
       case 'suspicious':
         return 'text-yellow-600 bg-yellow-100';
       case 'denied':
+      case 'already_redeemed':
       case 'error':
         return 'text-red-600 bg-red-100';
       default:
@@ -103,6 +124,7 @@ export default function Verify() {
       case 'suspicious':
         return '⚠️';
       case 'denied':
+      case 'already_redeemed':
       case 'error':
         return '❌';
       default:
@@ -137,7 +159,7 @@ export default function Verify() {
                   <textarea
                     value={qrData}
                     onChange={(e) => setQrData(e.target.value)}
-                    placeholder='Paste QR code data here (should be JSON like: {"token_id": 1, "event_id": "...", "metadata_uri": "ipfs://..."})'
+                    placeholder='Paste QR code data here (a TK1: credential or JSON like: {"token_id": 1, "event_id": "...", "metadata_uri": "ipfs://..."})'
                     className="w-full border border-gray-300 rounded-md p-3 min-h-[100px] text-gray-900 bg-white"
                   />
                   <p className="text-xs text-gray-500 mt-2">
@@ -154,7 +176,9 @@ export default function Verify() {
               {qrData && (
                 <div className="mt-2 p-2 bg-green-50 border border-green-200 rounded">
                   <p className="text-sm text-green-700">✓ QR Code data captured</p>
-                  {(() => {
+                  {qrData.startsWith('TK1:') ? (
+                    <p className="text-xs text-green-600 mt-1">Signed ticket credential</p>
+                  ) : (() => {
                     try {
                       const qrJson = JSON.parse(qrData);
                       return (
@@ -236,7 +260,7 @@ export default function Verify() {
               disabled={verifying || !qrData || !selfie}
               className="w-full bg-qie-primary hover:bg-qie-secondary disabled:bg-gray-400 text-white py-3 rounded-lg font-semibold text-lg transition-colors"
             >
-              {verifying ? 'Verifying...' : 'Verify Ticket'}
+              {verifying ? getStageLabel(stage) : 'Verify Ticket'}
             </button>
           </div>
 
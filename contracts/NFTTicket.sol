@@ -2,10 +2,13 @@
 pragma solidity ^0.8.20;
 
 import "@openzeppelin/contracts/token/ERC721/extensions/ERC721URIStorage.sol";
+import "@openzeppelin/contracts/token/ERC721/extensions/ERC721Enumerable.sol";
 import "@openzeppelin/contracts/access/Ownable.sol";
 import "@openzeppelin/contracts/utils/Counters.sol";
 
-contract NFTTicket is ERC721URIStorage, Ownable {
+// ERC721Enumerable keeps a per-owner token index (tokenOfOwnerByIndex), so a
+// wallet's tickets can be listed in O(balance) reads without an indexer
+contract NFTTicket is ERC721URIStorage, ERC721Enumerable, Ownable {
     using Counters for Counters.Counter;
     Counters.Counter private _tokenIds;
     
@@ -16,6 +19,24 @@ contract NFTTicket is ERC721URIStorage, Ownable {
     constructor() ERC721("QIE NFT Ticket", "QNFT") Ownable(msg.sender) {}
     
     function mint(address to, string memory uri) public onlyOwner returns (uint256) {
+        return _mintTicket(to, uri);
+    }
+    
+    // Mints to[i] the token with uri uris[i] in one transaction, emitting
+    // TicketMinted for each; returns the first token ID (the rest follow it)
+    function mintBatch(address[] calldata to, string[] calldata uris) public onlyOwner returns (uint256) {
+        require(to.length == uris.length, "Recipients and URIs differ in length");
+        require(to.length > 0, "Nothing to mint");
+        
+        uint256 firstTokenId = _tokenIds.current();
+        for (uint256 i = 0; i < to.length; i++) {
+            _mintTicket(to[i], uris[i]);
+        }
+        
+        return firstTokenId;
+    }
+    
+    function _mintTicket(address to, string memory uri) internal returns (uint256) {
         uint256 tokenId = _tokenIds.current();
         _tokenIds.increment();
         
@@ -27,14 +48,26 @@ contract NFTTicket is ERC721URIStorage, Ownable {
         return tokenId;
     }
     
-    function totalSupply() public view returns (uint256) {
-        return _tokenIds.current();
-    }
+    // totalSupply() comes from ERC721Enumerable and counts tokens in
+    // existence; token IDs are sequential, so it equals the number minted
+    // unless tokens were burned
     
-    function tokenURI(uint256 tokenId) public view override returns (string memory) {
+    function tokenURI(uint256 tokenId) public view override(ERC721, ERC721URIStorage) returns (string memory) {
         return super.tokenURI(tokenId);
     }
     
+    function supportsInterface(bytes4 interfaceId) public view override(ERC721URIStorage, ERC721Enumerable) returns (bool) {
+        return super.supportsInterface(interfaceId);
+    }
+    
+    function _update(address to, uint256 tokenId, address auth) internal override(ERC721, ERC721Enumerable) returns (address) {
+        return super._update(to, tokenId, auth);
+    }
+    
+    function _increaseBalance(address account, uint128 value) internal override(ERC721, ERC721Enumerable) {
+        super._increaseBalance(account, value);
+    }
+    
     function burn(uint256 tokenId) public {
         require(ownerOf(tokenId) == msg.sender, "Only token owner can burn");
         _burn(tokenId);
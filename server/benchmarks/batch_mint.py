@@ -0,0 +1,185 @@
+"""
+Batch Mint Throughput Benchmark
+Mints the same number of tickets one per transaction and with mintBatch,
+through the real QIEContract signing, nonce and receipt-parsing code, against
+a local JSON-RPC stand-in for the chain. The stand-in mines a block every
+--block-seconds and charges modeled gas (no EVM runs), so the numbers show
+the effect of transaction count on latency and gas, not absolute costs.
+
+Usage (from the server directory):
+    python -m benchmarks.batch_mint [--tickets 200] [--batch-size 100] [--block-seconds 0.5]
+"""
+
+import argparse
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import rlp
+from eth_abi import encode
+from eth_account import Account
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from services.blockchain import NFT_ABI
+from services.qie_sdk import QIEContract, QIEWeb3
+
+CONTRACT_ADDRESS = "0x" + "42" * 20
+# Modeled costs: base transaction plus per-token mint, URI storage and event
+TX_BASE_GAS = 21000
+MINT_GAS = 130000
+
+
+class StandInChain(BaseProvider):
+    """
+    JSON-RPC provider that executes mint and mintBatch without an EVM
+    """
+
+    def __init__(self, block_seconds: float):
+        self.block_seconds = block_seconds
+        self.started = time.monotonic()
+        self.contract = Web3().eth.contract(address=CONTRACT_ADDRESS, abi=NFT_ABI)
+        self.supply = 0
+        self.nonces = {}
+        self.receipts = {}
+        self.transactions = 0
+        self.gas_used = 0
+
+    def _next_block(self) -> tuple:
+        elapsed = time.monotonic() - self.started
+        number = math.floor(elapsed / self.block_seconds) + 1
+        return number, self.started + number * self.block_seconds
+
+    def _tokens(self, data: bytes) -> list:
+        function, args = self.contract.decode_function_input(data)
+        if function.fn_name == "mint":
+            return [(args["to"], args["uri"])]
+        return list(zip(args["to"], args["uris"]))
+
+    def _send(self, raw_hex: str) -> str:
+        raw = bytes.fromhex(raw_hex[2:])
+        nonce, _, _, _, _, data, _, _, _ = rlp.decode(raw)
+        sender = Account.recover_transaction(raw)
+        expected = self.nonces.get(sender, 0)
+        if int.from_bytes(nonce, "big") != expected:
+            raise ValueError(f"nonce {int.from_bytes(nonce, 'big')} != {expected}")
+        self.nonces[sender] = expected + 1
+
+        tx_hash = Web3.keccak(raw).hex()
+        number, mined_at = self._next_block()
+        block_hash = "0x" + f"{number:064x}"
+        signature = Web3.keccak(text="TicketMinted(address,uint256,string)").hex()
+        logs = []
+        for to, uri in self._tokens(data):
+            logs.append({
+                "address": CONTRACT_ADDRESS,
+                "topics": [signature, "0x" + to[2:].lower().rjust(64, "0"), "0x" + f"{self.supply:064x}"],
+                "data": "0x" + encode(["string"], [uri]).hex(),
+                "blockNumber": hex(number),
+                "blockHash": block_hash,
+                "transactionHash": tx_hash,
+                "transactionIndex": "0x0",
+                "logIndex": hex(len(logs)),
+                "removed": False
+            })
+            self.supply += 1
+
+        gas = TX_BASE_GAS + MINT_GAS * len(logs)
+        self.transactions += 1
+        self.gas_used += gas
+        self.receipts[tx_hash] = (mined_at, {
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "blockHash": block_hash,
+            "blockNumber": hex(number),
+            "from": sender,
+            "to": CONTRACT_ADDRESS,
+            "cumulativeGasUsed": hex(gas),
+            "gasUsed": hex(gas),
+            "effectiveGasPrice": "0x1",
+            "contractAddress": None,
+            "logs": logs,
+            "logsBloom": "0x" + "00" * 256,
+            "status": "0x1",
+            "type": "0x0"
+        })
+        return tx_hash
+
+    def _receipt(self, tx_hash: str):
+        mined_at, receipt = self.receipts.get(tx_hash, (None, None))
+        if mined_at is None or time.monotonic() < mined_at:
+            return None
+        return receipt
+
+    def make_request(self, method, params):
+        handlers = {
+            "eth_chainId": lambda: hex(1983),
+            "eth_gasPrice": lambda: "0x1",
+            "eth_getTransactionCount": lambda: hex(self.nonces.get(Web3.to_checksum_address(params[0]), 0)),
+            "eth_estimateGas": lambda: hex(TX_BASE_GAS + MINT_GAS * len(self._tokens(bytes.fromhex(params[0]["data"][2:])))),
+            "eth_sendRawTransaction": lambda: self._send(params[0]),
+            "eth_getTransactionReceipt": lambda: self._receipt(params[0]),
+            "eth_call": lambda: "0x" + encode(["uint256"], [self.supply]).hex(),
+        }
+        if method not in handlers:
+            raise NotImplementedError(method)
+        return {"jsonrpc": "2.0", "id": 1, "result": handlers[method]()}
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+def contract_on(chain: StandInChain) -> QIEContract:
+    qie_web3 = QIEWeb3("http://stand-in")
+    qie_web3.w3 = Web3(chain)
+    return QIEContract(qie_web3, CONTRACT_ADDRESS, NFT_ABI)
+
+
+def run(label: str, chain: StandInChain, mint_all) -> float:
+    started = time.monotonic()
+    token_ids = mint_all()
+    elapsed = time.monotonic() - started
+    assert sorted(token_ids) == list(range(len(token_ids))), "token IDs missing or duplicated"
+    print(f"{label:<28} {len(token_ids):>6} tokens  {chain.transactions:>5} txs  "
+          f"{chain.gas_used:>11,} gas  {elapsed:7.2f}s  {len(token_ids) / elapsed:8.1f} tokens/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent single mints (MINT_WORKERS)")
+    parser.add_argument("--block-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    key = Account.create().key.hex()
+    recipients = [Account.create().address for _ in range(args.tickets)]
+    uris = [f"ipfs://bafy-ticket-{i}" for i in range(args.tickets)]
+
+    chain = StandInChain(args.block_seconds)
+    contract = contract_on(chain)
+    single = run("mint, one at a time", chain, lambda: [
+        contract.mint(to, uri, key)["token_id"] for to, uri in zip(recipients, uris)
+    ])
+
+    chain = StandInChain(args.block_seconds)
+    contract = contract_on(chain)
+    with ThreadPoolExecutor(args.workers) as pool:
+        run(f"mint, {args.workers} concurrent", chain, lambda: [
+            result["token_id"] for result in pool.map(lambda pair: contract.mint(pair[0], pair[1], key), zip(recipients, uris))
+        ])
+
+    chain = StandInChain(args.block_seconds)
+    contract = contract_on(chain)
+    batched = run(f"mintBatch, {args.batch_size} per tx", chain, lambda: [
+        token_id
+        for start in range(0, args.tickets, args.batch_size)
+        for token_id in contract.mint_batch(recipients[start:start + args.batch_size], uris[start:start + args.batch_size], key)["token_ids"]
+    ])
+
+    print(f"\nmintBatch is {single / batched:.0f}x faster than one-at-a-time minting")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Verify Pipeline Memory Benchmark
+Measures memory per concurrent scan spent building AI provider image
+payloads, comparing the old read-then-encode approach with the streaming
+encoder used by services/ai_verify.py:
+- RSS per scan: growth of the process's peak resident set while the scans'
+  payloads are built, each approach in a fresh process
+- Python heap per scan: tracemalloc peak, which excludes allocator overhead
+  and memory the interpreter keeps after freeing it
+
+Usage (from the server directory):
+    python -m benchmarks.verify_memory [--image-mb 3] [--concurrency 8]
+"""
+
+import argparse
+import base64
+import multiprocessing
+import os
+import resource
+import tempfile
+import tracemalloc
+
+from services.ai_verify import Base64Builder, encode_image
+
+
+def spooled_upload(data: bytes):
+    # Same spooling threshold Starlette uses for UploadFile
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return spooled
+
+
+def build_payload_previous(selfie_file, ticket_image: bytes) -> list:
+    selfie_data = selfie_file.read()
+    selfie_base64 = base64.b64encode(selfie_data).decode('utf-8')
+    ticket_image_base64 = base64.b64encode(ticket_image).decode('utf-8')
+    return [
+        {"url": f"data:image/jpeg;base64,{selfie_base64}"},
+        {"url": f"data:image/jpeg;base64,{ticket_image_base64}"},
+        selfie_data,
+        ticket_image,
+        selfie_base64,
+        ticket_image_base64,
+    ]
+
+
+def build_payload_streaming(selfie_file, ticket_image: bytes) -> list:
+    encoder = Base64Builder(data_uri=True)
+    # Simulate the ticket image arriving from the gateway in 64 KiB chunks
+    for start in range(0, len(ticket_image), 64 * 1024):
+        encoder.feed(ticket_image[start:start + 64 * 1024])
+    return [
+        {"url": encode_image(selfie_file, data_uri=True)},
+        {"url": encoder.finish()},
+    ]
+
+
+def _build_all(build, image: bytes, uploads: list) -> list:
+    # Scans in flight at the same time each hold their payload until the provider answers
+    in_flight = []
+    for upload in uploads:
+        # The gateway response body is freshly allocated per scan
+        ticket_image = bytes(bytearray(image))
+        in_flight.append(build(upload, ticket_image))
+        del ticket_image
+    return in_flight
+
+
+def measure(build, image: bytes, concurrency: int) -> float:
+    """Python heap peak (bytes) per scan"""
+    uploads = [spooled_upload(image) for _ in range(concurrency)]
+    tracemalloc.start()
+    in_flight = _build_all(build, image, uploads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del in_flight
+    for upload in uploads:
+        upload.close()
+    return peak / concurrency
+
+
+def _max_rss() -> int:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _rss_worker(build_name: str, image_bytes: int, concurrency: int, results):
+    image = os.urandom(image_bytes)
+    uploads = [spooled_upload(image) for _ in range(concurrency)]
+    before = _max_rss()
+    in_flight = _build_all(globals()[build_name], image, uploads)
+    results.put((_max_rss() - before) / concurrency)
+    del in_flight
+
+
+def measure_rss(build, image_bytes: int, concurrency: int) -> float:
+    """Peak RSS growth (bytes) per scan, measured in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    worker = context.Process(target=_rss_worker, args=(build.__name__, image_bytes, concurrency, results))
+    worker.start()
+    rss = results.get()
+    worker.join()
+    return rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-mb", type=float, default=3.0, help="Selfie and ticket image size in MiB")
+    parser.add_argument("--concurrency", type=int, default=8, help="Scans in flight at once")
+    args = parser.parse_args()
+
+    image_bytes = int(args.image_mb * 1024 * 1024)
+    image = os.urandom(image_bytes)
+    mib = 1024 * 1024
+
+    rss_previous = measure_rss(build_payload_previous, image_bytes, args.concurrency)
+    rss_streaming = measure_rss(build_payload_streaming, image_bytes, args.concurrency)
+    heap_previous = measure(build_payload_previous, image, args.concurrency)
+    heap_streaming = measure(build_payload_streaming, image, args.concurrency)
+
+    print(f"Image size:            {args.image_mb:.1f} MiB (selfie and ticket image)")
+    print(f"Concurrent scans:      {args.concurrency}")
+    print(f"RSS per scan before:   {rss_previous / mib:.1f} MiB")
+    print(f"RSS per scan after:    {rss_streaming / mib:.1f} MiB")
+    print(f"Heap per scan before:  {heap_previous / mib:.1f} MiB")
+    print(f"Heap per scan after:   {heap_streaming / mib:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
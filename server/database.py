@@ -1,4 +1,5 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
 import os
 from dotenv import load_dotenv
 
@@ -7,24 +8,128 @@ load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
 DATABASE_NAME = "nft_ticketing"
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
 
-try:
-    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
-    # Test connection
-    client.server_info()
-    print(f"✓ MongoDB connected: {MONGO_URL}")
-except Exception as e:
-    print(f"✗ MongoDB connection failed: {e}")
-    print("Please start MongoDB or check your MONGO_URL in .env")
-    print("See MONGODB_SETUP.md for instructions")
-    client = None
+# Motor connects lazily; check_connection() reports status at startup
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    serverSelectionTimeoutMS=5000,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE
+)
 
-db = client[DATABASE_NAME] if client else None
+db = client[DATABASE_NAME]
 
 users_collection = db["users"]
 events_collection = db["events"]
 tickets_collection = db["tickets"]
 verifications_collection = db["verifications"]
+checkins_collection = db["checkin_rollups"]
+sales_collection = db["sales_rollups"]
+orders_collection = db["mint_orders"]
+pins_collection = db["pins"]
+content_collection = db["content_hashes"]
+images_collection = db["image_derivatives"]
+
+# Every index the hot query paths rely on, per collection. ensure_indexes()
+# applies them at startup; GET /admin/indexes compares them with the server.
+# (events are joined on _id, which MongoDB always indexes)
+INDEXES = {
+    "events": [
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+        IndexModel([("reservations.expires_at", ASCENDING)], name="reservations_expires_at", sparse=True),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at", sparse=True),
+    ],
+    "users": [
+        IndexModel([("wallet_address", ASCENDING)], name="wallet_address_unique", unique=True),
+    ],
+    "tickets": [
+        IndexModel([("token_id", ASCENDING)], name="token_id_unique", unique=True),
+        IndexModel([("owner_address", ASCENDING), ("_id", ASCENDING)], name="owner_address_id"),
+        # Also serves queries on event_id alone
+        IndexModel([("event_id", ASCENDING), ("updated_at", ASCENDING)], name="event_id_updated_at"),
+        IndexModel([("redeemed_at", ASCENDING)], name="redeemed_at", sparse=True),
+    ],
+    "verifications": [
+        IndexModel([("verified_at", DESCENDING), ("_id", DESCENDING)], name="verified_at_id"),
+        IndexModel([("event_id", ASCENDING), ("verified_at", DESCENDING), ("_id", DESCENDING)], name="event_id_verified_at_id"),
+        IndexModel([("status", ASCENDING), ("verified_at", DESCENDING), ("_id", DESCENDING)], name="status_verified_at_id"),
+    ],
+    "checkin_rollups": [
+        IndexModel([("event_id", ASCENDING), ("minute", ASCENDING)], name="event_id_minute_unique", unique=True),
+        IndexModel([("event_id", ASCENDING), ("updated_at", ASCENDING)], name="event_id_updated_at"),
+    ],
+    "sales_rollups": [
+        IndexModel([("event_id", ASCENDING), ("hour", ASCENDING)], name="event_id_hour_unique", unique=True),
+    ],
+    "mint_orders": [
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key_unique", unique=True, sparse=True),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+    ],
+    "pins": [
+        IndexModel([("host", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="host_status_next_attempt_at"),
+    ],
+}
+
+async def ensure_indexes():
+    """Create any declared index that is missing; existing ones are left as they are"""
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except Exception as e:
+                # e.g. duplicate data blocking a unique index, or a conflicting
+                # index with the same keys; report it instead of failing startup
+                print(f"✗ Could not create index {collection_name}.{index.document['name']}: {e}")
+
+async def index_report() -> dict:
+    """
+    Compare declared indexes with the ones on the server
+    
+    Returns:
+        Per collection: declared indexes with presence and usage counts,
+        missing declared indexes, unused indexes and undeclared indexes
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        usage = {}
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                usage[stat["name"]] = {"ops": stat["accesses"]["ops"], "since": stat["accesses"]["since"].isoformat()}
+        except Exception as e:
+            print(f"Index usage unavailable for {collection_name}: {e}")
+        
+        declared_names = [index.document["name"] for index in indexes]
+        report[collection_name] = {
+            "declared": [
+                {
+                    "name": index.document["name"],
+                    "keys": list(index.document["key"].items()),
+                    "unique": index.document.get("unique", False),
+                    "present": index.document["name"] in existing,
+                    "usage": usage.get(index.document["name"])
+                }
+                for index in indexes
+            ],
+            "missing": [name for name in declared_names if name not in existing],
+            "unused": [name for name in existing if name != "_id_" and usage.get(name, {}).get("ops") == 0],
+            "undeclared": [name for name in existing if name != "_id_" and name not in declared_names]
+        }
+    return report
+
+async def check_connection() -> bool:
+    try:
+        await client.server_info()
+        print(f"✓ MongoDB connected: {MONGO_URL}")
+        return True
+    except Exception as e:
+        print(f"✗ MongoDB connection failed: {e}")
+        print("Please start MongoDB or check your MONGO_URL in .env")
+        print("See MONGODB_SETUP.md for instructions")
+        return False
 
 def get_database():
     return db
@@ -1,6 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import auth, events, tickets, verify, validator
+from routes import auth, events, tickets, verify, validator, admin
+from database import check_connection, ensure_indexes
+from services.inventory import inventory_service
+from services.event_cache import event_cache
+from services.record_writer import verification_writer
+from services.mint_orders import mint_order_service
+from services.ipfs_service import ipfs_service
+from services.redemptions import redemption_service
 import os
 from dotenv import load_dotenv
 
@@ -15,6 +22,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paging and manifest sync read these from browser clients
+    expose_headers=["X-Next-Cursor", "X-Manifest-Generated-At"],
 )
 
 app.include_router(auth.router)
@@ -22,6 +31,27 @@ app.include_router(events.router)
 app.include_router(tickets.router)
 app.include_router(verify.router)
 app.include_router(validator.router)
+app.include_router(admin.router)
+
+@app.on_event("startup")
+async def startup():
+    if await check_connection():
+        await ensure_indexes()
+    inventory_service.start()
+    event_cache.start()
+    redemption_service.start()
+    verification_writer.start()
+    mint_order_service.start()
+    ipfs_service.pin_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await inventory_service.stop()
+    await event_cache.stop()
+    await redemption_service.stop()
+    await mint_order_service.stop()
+    await ipfs_service.pin_queue.stop()
+    await verification_writer.stop()
 
 @app.get("/")
 async def root():
@@ -33,7 +63,8 @@ async def root():
             "events": "/events",
             "tickets": "/tickets",
             "verify": "/verify",
-            "validator": "/validator"
+            "validator": "/validator",
+            "admin": "/admin"
         }
     }
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Ticket(BaseModel):
@@ -7,6 +7,7 @@ class Ticket(BaseModel):
     event_id: str
     owner_address: str
     metadata_uri: str
+    image_uri: Optional[str] = None
     qr_code_data: str
     minted_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -14,3 +15,15 @@ class TicketMintRequest(BaseModel):
     event_id: str
     wallet_address: str
     buyer_image_url: str
+
+class BulkMintRecipient(BaseModel):
+    wallet_address: str
+    # IPFS URI of the holder's photo; the event image is used when omitted
+    image_uri: Optional[str] = None
+
+class BulkMintRequest(BaseModel):
+    event_id: str
+    organizer_address: str
+    recipients: List[BulkMintRecipient]
+    # Price paid per ticket, for sales analytics; 0 for comps
+    ticket_price: float = 0
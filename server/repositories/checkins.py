@@ -0,0 +1,78 @@
+"""
+Check-in rollup data access
+One document per event per minute, holding verification counts by status.
+Counts are only ever changed with $inc, so concurrent writers never race.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from pymongo import UpdateOne
+from database import checkins_collection
+
+
+def _minute(moment: datetime) -> datetime:
+    return moment.replace(second=0, microsecond=0)
+
+
+async def increment_checkins(records: List[dict]):
+    """
+    Count verification records into their event's minute buckets
+
+    Args:
+        records: Verification records; ones without an event_id are skipped
+    """
+    counts = Counter(
+        (record["event_id"], _minute(record["verified_at"]), record["status"])
+        for record in records
+        if record.get("event_id")
+    )
+    if not counts:
+        return
+
+    buckets = {}
+    for (event_id, minute, status), count in counts.items():
+        bucket = buckets.setdefault((event_id, minute), Counter())
+        bucket[f"counts.{status}"] += count
+        bucket["total"] += count
+
+    now = datetime.utcnow()
+    await checkins_collection.bulk_write([
+        UpdateOne(
+            {"event_id": event_id, "minute": minute},
+            {"$inc": dict(increments), "$set": {"updated_at": now}},
+            upsert=True
+        )
+        for (event_id, minute), increments in buckets.items()
+    ], ordered=False)
+
+
+async def find_checkins(
+    event_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    updated_since: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Minute buckets of one event in time order
+
+    Args:
+        event_id: Event to read
+        since: Only minutes at or after this time
+        until: Only minutes before this time
+        updated_since: Only buckets changed at or after this time
+
+    Returns:
+        Bucket documents with minute, counts (by status), total and updated_at
+    """
+    query = {"event_id": event_id}
+    if since or until:
+        query["minute"] = {}
+        if since:
+            query["minute"]["$gte"] = _minute(since)
+        if until:
+            query["minute"]["$lt"] = until
+    if updated_since:
+        query["updated_at"] = {"$gte": updated_since}
+    cursor = checkins_collection.find(query, {"_id": 0, "event_id": 0}).sort("minute", 1)
+    return await cursor.to_list(length=None)
@@ -0,0 +1,21 @@
+"""
+Content hash data access
+Maps the sha256 of uploaded content to the IPFS CID it was stored under.
+"""
+
+from datetime import datetime
+from typing import Optional
+from database import content_collection
+
+
+async def find_cid(sha256: str) -> Optional[str]:
+    document = await content_collection.find_one({"_id": sha256}, {"cid": 1})
+    return document["cid"] if document else None
+
+
+async def record_cid(sha256: str, cid: str, size: int):
+    await content_collection.update_one(
+        {"_id": sha256},
+        {"$setOnInsert": {"cid": cid, "size": size, "created_at": datetime.utcnow()}},
+        upsert=True
+    )
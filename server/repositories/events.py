@@ -0,0 +1,169 @@
+"""
+Event data access
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from database import events_collection
+
+
+async def find_event(event_id: str) -> Optional[dict]:
+    return await events_collection.find_one({"_id": ObjectId(event_id)})
+
+
+async def find_events_by_ids(event_ids: Iterable[str], projection: Optional[dict] = None) -> Dict[str, dict]:
+    """Fetch many events in one query, keyed by string ID; invalid IDs are skipped"""
+    object_ids = [ObjectId(event_id) for event_id in set(event_ids) if ObjectId.is_valid(event_id)]
+    if not object_ids:
+        return {}
+    events = await events_collection.find({"_id": {"$in": object_ids}}, projection).to_list(length=None)
+    return {str(event["_id"]): event for event in events}
+
+
+def events_cursor(after: Optional[tuple] = None, projection: Optional[dict] = None):
+    """
+    Cursor over events by date, then _id
+
+    Args:
+        after: (date, _id) of the last event already returned
+        projection: Fields to return; date is always included for paging
+    """
+    query = {}
+    if after:
+        date, document_id = after
+        query = {"$or": [
+            {"date": {"$gt": date}},
+            {"date": date, "_id": {"$gt": document_id}}
+        ]}
+    if projection:
+        projection = {**projection, "date": 1}
+    return events_collection.find(query, projection).sort([("date", 1), ("_id", 1)])
+
+
+async def list_events(limit: int, after: Optional[tuple] = None, projection: Optional[dict] = None) -> List[dict]:
+    return await events_cursor(after, projection).limit(limit).to_list(length=limit)
+
+
+async def insert_event(event: dict):
+    return await events_collection.insert_one(event)
+
+
+async def reserve_seats(event_id: str, reservation: dict) -> bool:
+    """
+    Hold seats if the event still has them, in one atomic update
+
+    Args:
+        event_id: Event to reserve on
+        reservation: {"id", "quantity", "expires_at"}
+
+    Returns:
+        False if sold + reserved + quantity would exceed total_supply
+    """
+    quantity = reservation["quantity"]
+    event = await events_collection.find_one_and_update(
+        {
+            "_id": ObjectId(event_id),
+            "$expr": {"$lte": [
+                {"$add": ["$sold_count", {"$ifNull": ["$reserved_count", 0]}, quantity]},
+                "$total_supply"
+            ]}
+        },
+        {
+            "$inc": {"reserved_count": quantity},
+            "$push": {"reservations": reservation}
+        },
+        projection={"_id": 1}
+    )
+    return event is not None
+
+
+async def commit_reservation(event_id: str, reservation_id: str, quantity: int) -> bool:
+    """Turn held seats into sold ones; False if the reservation no longer exists"""
+    result = await events_collection.update_one(
+        {"_id": ObjectId(event_id), "reservations.id": reservation_id},
+        {
+            "$pull": {"reservations": {"id": reservation_id}},
+            "$inc": {"reserved_count": -quantity, "sold_count": quantity},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+    )
+    return result.modified_count == 1
+
+
+async def extend_reservation(event_id: str, reservation_id: str, expires_at: datetime) -> bool:
+    """Move a reservation's expiry; False if the reservation no longer exists"""
+    result = await events_collection.update_one(
+        {"_id": ObjectId(event_id), "reservations.id": reservation_id},
+        {"$set": {"reservations.$.expires_at": expires_at}}
+    )
+    return result.matched_count == 1
+
+
+async def release_reservation(event_id: str, reservation_id: str, quantity: int, expired_before: Optional[datetime] = None) -> bool:
+    """
+    Give held seats back; False if the reservation no longer exists
+
+    Args:
+        expired_before: Only release it if it still expires before this time
+            (so a reservation extended meanwhile is kept)
+    """
+    reservation = {"id": reservation_id}
+    if expired_before:
+        reservation["expires_at"] = {"$lt": expired_before}
+    result = await events_collection.update_one(
+        {"_id": ObjectId(event_id), "reservations": {"$elemMatch": reservation}},
+        {
+            "$pull": {"reservations": {"id": reservation_id}},
+            "$inc": {"reserved_count": -quantity}
+        }
+    )
+    return result.modified_count == 1
+
+
+async def sell_unreserved_seats(event_id: str, quantity: int) -> bool:
+    """Count seats as sold without a reservation, only if the event still has them free"""
+    result = await events_collection.update_one(
+        {
+            "_id": ObjectId(event_id),
+            "$expr": {"$lte": [
+                {"$add": ["$sold_count", {"$ifNull": ["$reserved_count", 0]}, quantity]},
+                "$total_supply"
+            ]}
+        },
+        {"$inc": {"sold_count": quantity}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count == 1
+
+
+async def set_image_variants(event_id: str, variants: List[dict]):
+    return await events_collection.update_one(
+        {"_id": ObjectId(event_id)},
+        {"$set": {"image_variants": variants, "updated_at": datetime.utcnow()}}
+    )
+
+
+def events_missing_image_variants_cursor(include_existing: bool = False):
+    """Cursor over events (ID and image_url only) whose image has no derivatives yet, or all events"""
+    query = {} if include_existing else {"image_variants": {"$exists": False}}
+    return events_collection.find(query, {"image_url": 1})
+
+
+async def find_updated_event_ids(since: datetime) -> List[str]:
+    """IDs of events created or changed after since (for cache polling)"""
+    cursor = events_collection.find({"updated_at": {"$gt": since}}, {"_id": 1})
+    return [str(event["_id"]) async for event in cursor]
+
+
+async def find_expired_reservations(now: datetime) -> List[tuple]:
+    """(event_id, reservation) for every reservation that expired before now"""
+    expired = []
+    cursor = events_collection.find(
+        {"reservations.expires_at": {"$lt": now}},
+        {"reservations": 1}
+    )
+    async for event in cursor:
+        for reservation in event["reservations"]:
+            if reservation["expires_at"] < now:
+                expired.append((str(event["_id"]), reservation))
+    return expired
@@ -0,0 +1,39 @@
+"""
+Image derivative data access
+Resized event images keyed by the sha256 of their encoded bytes.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from bson import Binary
+from pymongo import UpdateOne
+from database import images_collection
+
+
+async def store_images(images: List[dict]):
+    """
+    Store encoded images; content already stored is left as it is
+
+    Args:
+        images: {"sha256", "content_type", "data"} per image
+    """
+    if not images:
+        return
+    now = datetime.utcnow()
+    await images_collection.bulk_write([
+        UpdateOne(
+            {"_id": image["sha256"]},
+            {"$setOnInsert": {
+                "content_type": image["content_type"],
+                "data": Binary(image["data"]),
+                "size": len(image["data"]),
+                "created_at": now
+            }},
+            upsert=True
+        )
+        for image in images
+    ], ordered=False)
+
+
+async def find_image(sha256: str) -> Optional[dict]:
+    return await images_collection.find_one({"_id": sha256})
@@ -0,0 +1,69 @@
+"""
+Mint order data access
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from database import orders_collection
+
+
+async def insert_order(order: dict):
+    """Insert a new order; raises DuplicateKeyError if its idempotency key is taken"""
+    return await orders_collection.insert_one(order)
+
+
+async def find_order(order_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(order_id):
+        return None
+    return await orders_collection.find_one({"_id": ObjectId(order_id)})
+
+
+async def find_order_by_key(idempotency_key: str) -> Optional[dict]:
+    return await orders_collection.find_one({"idempotency_key": idempotency_key})
+
+
+async def claim_order(order_id: ObjectId) -> Optional[dict]:
+    """Move a queued order to running; None if another worker already took it"""
+    return await orders_collection.find_one_and_update(
+        {"_id": order_id, "status": "queued"},
+        {"$set": {"status": "running", "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def set_stage(order_id: ObjectId, stage: str, fields: Optional[dict] = None):
+    """
+    Record that an order entered a pipeline stage
+
+    Args:
+        order_id: Order to update
+        stage: Stage name, also appended to the order's history
+        fields: Other fields to set alongside, e.g. outputs of the previous stage
+    """
+    now = datetime.utcnow()
+    update = {
+        "$set": {"stage": stage, "updated_at": now, **(fields or {})},
+        "$push": {"history": {"stage": stage, "at": now}}
+    }
+    await orders_collection.update_one({"_id": order_id}, update)
+
+
+async def update_order(order_id: ObjectId, fields: dict):
+    await orders_collection.update_one({"_id": order_id}, {"$set": {**fields, "updated_at": datetime.utcnow()}})
+
+
+async def find_unfinished_orders() -> List[dict]:
+    """Queued and running orders, oldest first"""
+    cursor = orders_collection.find({"status": {"$in": ["queued", "running"]}}).sort("_id", 1)
+    return await cursor.to_list(length=None)
+
+
+async def requeue_order(order_id: ObjectId, last_updated: datetime) -> bool:
+    """Put a stalled running order back in the queue unless it moved since last_updated"""
+    result = await orders_collection.update_one(
+        {"_id": order_id, "status": "running", "updated_at": last_updated},
+        {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count == 1
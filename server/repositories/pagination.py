@@ -0,0 +1,31 @@
+"""
+Keyset pagination cursors
+A cursor captures the sort key of the last item on a page so the next page
+can resume with an indexed range query instead of skip().
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+from bson import ObjectId
+
+
+def encode_cursor(sort_value: datetime, document_id: ObjectId) -> str:
+    raw = json.dumps([sort_value.isoformat(), str(document_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), ObjectId(document_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,101 @@
+"""
+IPFS pin queue data access
+One document per CID, tracking whether its content has been pinned yet.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from database import pins_collection
+
+
+async def enqueue_pin(cid: str, sha256: str, filename: str, size: int, host: str) -> str:
+    """
+    Queue a CID for pinning
+
+    A CID already queued or pinned is left as it is; one whose pin failed is
+    queued again with a fresh attempt count, since its content was just spooled anew.
+
+    Returns:
+        Status of the pin after the call
+    """
+    now = datetime.utcnow()
+    retry = {
+        "sha256": sha256,
+        "filename": filename,
+        "size": size,
+        "host": host,
+        "status": "queued",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "updated_at": now
+    }
+    result = await pins_collection.update_one({"_id": cid, "status": "failed"}, {"$set": retry})
+    if result.matched_count:
+        return "queued"
+
+    existing = await pins_collection.find_one_and_update(
+        {"_id": cid},
+        {"$setOnInsert": {**retry, "created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    return existing["status"] if existing else "queued"
+
+
+async def claim_due_pin(host: str, lease: timedelta) -> Optional[dict]:
+    """
+    Take the next pin that is due on this host
+
+    Args:
+        host: Host whose spool holds the content
+        lease: How long a claimed pin may stay in progress before it is
+            assumed abandoned and can be claimed again
+
+    Returns:
+        The claimed pin, or None if nothing is due
+    """
+    now = datetime.utcnow()
+    return await pins_collection.find_one_and_update(
+        {
+            "host": host,
+            "$or": [
+                {"status": "queued", "next_attempt_at": {"$lte": now}},
+                {"status": "pinning", "updated_at": {"$lt": now - lease}}
+            ]
+        },
+        {"$set": {"status": "pinning", "updated_at": now}, "$inc": {"attempts": 1}},
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def mark_pinned(cid: str, pinned_cid: str):
+    now = datetime.utcnow()
+    await pins_collection.update_one(
+        {"_id": cid},
+        {"$set": {"status": "pinned", "pinned_cid": pinned_cid, "pinned_at": now, "updated_at": now},
+         "$unset": {"last_error": ""}}
+    )
+
+
+async def mark_failed(cid: str, error: str, retry_at: Optional[datetime]):
+    """Record a failed attempt; retry_at None gives up on the pin"""
+    update = {"last_error": error, "updated_at": datetime.utcnow()}
+    if retry_at:
+        update.update({"status": "queued", "next_attempt_at": retry_at})
+    else:
+        update["status"] = "failed"
+    await pins_collection.update_one({"_id": cid}, {"$set": update})
+
+
+async def pin_summary(limit: int = 20) -> Dict:
+    """Pin counts by status, plus the most recent failures"""
+    counts = {}
+    async for row in pins_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    failures: List[dict] = await pins_collection.find(
+        {"last_error": {"$exists": True}},
+        {"filename": 1, "status": 1, "attempts": 1, "last_error": 1, "updated_at": 1}
+    ).sort("updated_at", -1).to_list(length=limit)
+    return {"counts": counts, "recent_failures": failures}
@@ -0,0 +1,42 @@
+"""
+Sales rollup data access
+Per event, one document per hour plus one running total (hour None), each
+holding tickets sold, revenue and a HyperLogLog sketch of buyer wallets.
+Updates use $inc and $max only, so concurrent mints never race.
+"""
+
+from datetime import datetime
+from typing import List
+from pymongo import UpdateOne
+from database import sales_collection
+from services import hll
+
+
+async def record_sale(event_id: str, buyer_address: str, quantity: int, revenue: float, sold_at: datetime):
+    """
+    Add a committed sale to the event's total and hourly rollups
+
+    Args:
+        event_id: Event the tickets belong to
+        buyer_address: Wallet that bought them
+        quantity: Tickets sold
+        revenue: Total price paid
+        sold_at: Commit time
+    """
+    index, rank = hll.register(buyer_address.lower())
+    update = {
+        "$inc": {"tickets": quantity, "revenue": revenue},
+        "$max": {f"buyers.{index}": rank},
+        "$set": {"updated_at": datetime.utcnow()}
+    }
+    hour = sold_at.replace(minute=0, second=0, microsecond=0)
+    await sales_collection.bulk_write([
+        UpdateOne({"event_id": event_id, "hour": None}, update, upsert=True),
+        UpdateOne({"event_id": event_id, "hour": hour}, update, upsert=True)
+    ], ordered=False)
+
+
+async def find_sales(event_id: str) -> List[dict]:
+    """Rollups of one event: the total first (hour None), then hours in order"""
+    cursor = sales_collection.find({"event_id": event_id}, {"_id": 0, "event_id": 0}).sort("hour", 1)
+    return await cursor.to_list(length=None)
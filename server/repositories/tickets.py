@@ -0,0 +1,70 @@
+"""
+Ticket data access
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from database import tickets_collection
+
+
+async def insert_ticket(ticket: dict):
+    return await tickets_collection.insert_one(ticket)
+
+
+async def insert_tickets(tickets: List[dict]):
+    return await tickets_collection.insert_many(tickets, ordered=False)
+
+
+async def find_tickets_by_owner(owner_address: str, skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """Tickets of one wallet in mint order, optionally paged with skip/limit"""
+    cursor = tickets_collection.find({"owner_address": owner_address.lower()}).sort("_id", 1).skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def find_ticket_event_id(token_id: int) -> Optional[str]:
+    """Event a minted ticket belongs to, or None if the ticket is unknown"""
+    ticket = await tickets_collection.find_one({"token_id": token_id}, {"_id": 0, "event_id": 1})
+    return ticket["event_id"] if ticket else None
+
+
+def event_tickets_cursor(event_id: str, since: Optional[datetime] = None):
+    """
+    Cursor over an event's tickets in token order, for manifests
+
+    Args:
+        event_id: Event to read
+        since: Only tickets changed at or after this time
+    """
+    query = {"event_id": event_id}
+    if since:
+        query["updated_at"] = {"$gte": since}
+    return tickets_collection.find(
+        query,
+        {"_id": 0, "token_id": 1, "owner_address": 1, "image_uri": 1, "redeemed_at": 1}
+    ).sort("token_id", 1)
+
+
+async def redeem_ticket(token_id: int, gate_id: str, redeemed_at: datetime) -> str:
+    """
+    Record a ticket's one admission, atomically
+
+    Returns:
+        "redeemed" if this call redeemed it, "already_redeemed" if it was
+        used before, "not_found" if no such ticket exists
+    """
+    result = await tickets_collection.update_one(
+        {"token_id": token_id, "redeemed_at": {"$exists": False}},
+        {"$set": {"redeemed_at": redeemed_at, "redeemed_gate": gate_id, "updated_at": redeemed_at}}
+    )
+    if result.modified_count == 1:
+        return "redeemed"
+    exists = await tickets_collection.find_one({"token_id": token_id}, {"_id": 1})
+    return "already_redeemed" if exists else "not_found"
+
+
+async def find_redeemed_token_ids(since: datetime) -> List[int]:
+    """Token IDs of tickets redeemed after since"""
+    cursor = tickets_collection.find({"redeemed_at": {"$gt": since}}, {"_id": 0, "token_id": 1})
+    return [ticket["token_id"] async for ticket in cursor]
@@ -0,0 +1,23 @@
+"""
+User data access
+"""
+
+from typing import Optional
+from database import users_collection
+
+
+async def find_user_by_wallet(wallet_address: str) -> Optional[dict]:
+    return await users_collection.find_one({"wallet_address": wallet_address.lower()})
+
+
+async def insert_user(user: dict):
+    return await users_collection.insert_one(user)
+
+
+async def set_organizer(wallet_address: str) -> int:
+    """Flag a user as organizer; returns the number of documents modified"""
+    result = await users_collection.update_one(
+        {"wallet_address": wallet_address.lower()},
+        {"$set": {"is_organizer": True}}
+    )
+    return result.modified_count
@@ -0,0 +1,68 @@
+"""
+Verification record data access
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from pymongo import WriteConcern
+from database import verifications_collection
+
+
+async def insert_verifications(records: List[dict], write_concern: WriteConcern):
+    """Insert a batch; with ordered=False one duplicate does not stop the rest"""
+    return await verifications_collection.with_options(write_concern=write_concern).insert_many(records, ordered=False)
+
+
+async def find_verifications(
+    limit: int,
+    after: Optional[tuple] = None,
+    event_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Newest-first page of verifications joined with their ticket in one pass
+
+    Args:
+        limit: Page size
+        after: (verified_at, _id) of the last record on the previous page
+        event_id: Only verifications for this event
+        status: Only verifications with this status
+        since: Only verifications at or after this time
+        until: Only verifications before this time
+
+    Returns:
+        Verification records, each with a "ticket" list holding the matching
+        ticket (empty if the ticket is unknown)
+    """
+    match = {}
+    if event_id:
+        match["event_id"] = event_id
+    if status:
+        match["status"] = status
+    if since or until:
+        match["verified_at"] = {}
+        if since:
+            match["verified_at"]["$gte"] = since
+        if until:
+            match["verified_at"]["$lt"] = until
+    if after:
+        verified_at, document_id = after
+        match["$or"] = [
+            {"verified_at": {"$lt": verified_at}},
+            {"verified_at": verified_at, "_id": {"$lt": document_id}}
+        ]
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"verified_at": -1, "_id": -1}},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": "tickets",
+            "localField": "token_id",
+            "foreignField": "token_id",
+            "as": "ticket"
+        }}
+    ]
+    return await verifications_collection.aggregate(pipeline).to_list(length=limit)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+from database import index_report
+from repositories import pins as pins_repo
+from services.record_writer import verification_writer
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/indexes")
+async def get_indexes():
+    """
+    Report declared MongoDB indexes against the ones on the server
+    
+    Returns:
+        Per collection: declared, missing, unused and undeclared indexes
+    """
+    try:
+        return await index_report()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/pins")
+async def get_pins():
+    """
+    Report the IPFS pin queue
+    
+    Returns:
+        Pin counts by status (queued, pinning, pinned, failed) and the most
+        recent pins with errors
+    """
+    try:
+        summary = await pins_repo.pin_summary()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    for pin in summary["recent_failures"]:
+        pin["cid"] = pin.pop("_id")
+        pin["updated_at"] = pin["updated_at"].isoformat()
+    return summary
+
+@router.get("/writes")
+async def get_writes():
+    """
+    Report the write-behind queue of verification records
+    
+    Returns:
+        Records queued and dropped because the queue was full, and stored
+        records whose check-in rollup update is still waiting for a retry
+    """
+    return verification_writer.stats()
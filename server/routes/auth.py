@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from models.user import UserCreate
-from database import users_collection
+from repositories import users as users_repo
 from services.blockchain import blockchain_service
 from datetime import datetime
 
@@ -15,7 +15,7 @@ async def wallet_login(user_data: UserCreate):
     ):
         raise HTTPException(status_code=401, detail="Invalid signature")
     
-    existing_user = users_collection.find_one({"wallet_address": user_data.wallet_address.lower()})
+    existing_user = await users_repo.find_user_by_wallet(user_data.wallet_address)
     
     if not existing_user:
         new_user = {
@@ -23,7 +23,7 @@ async def wallet_login(user_data: UserCreate):
             "is_organizer": False,
             "created_at": datetime.utcnow()
         }
-        users_collection.insert_one(new_user)
+        await users_repo.insert_user(new_user)
         return {"message": "User created", "wallet_address": user_data.wallet_address.lower(), "is_organizer": False}
     
     return {
@@ -36,7 +36,7 @@ async def wallet_login(user_data: UserCreate):
 async def make_organizer(wallet_address: str):
     try:
         # First, ensure user exists
-        existing_user = users_collection.find_one({"wallet_address": wallet_address.lower()})
+        existing_user = await users_repo.find_user_by_wallet(wallet_address)
         if not existing_user:
             # Create user if doesn't exist
             new_user = {
@@ -44,16 +44,13 @@ async def make_organizer(wallet_address: str):
                 "is_organizer": True,
                 "created_at": datetime.utcnow()
             }
-            users_collection.insert_one(new_user)
+            await users_repo.insert_user(new_user)
             return {"message": "User created and set as organizer"}
         
         # Update existing user
-        result = users_collection.update_one(
-            {"wallet_address": wallet_address.lower()},
-            {"$set": {"is_organizer": True}}
-        )
+        modified_count = await users_repo.set_organizer(wallet_address)
         
-        if result.modified_count > 0 or existing_user.get("is_organizer", False):
+        if modified_count > 0 or existing_user.get("is_organizer", False):
             return {"message": "User is now an organizer"}
         
         return {"message": "User is already an organizer"}
@@ -1,13 +1,51 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from models.event import EventCreate
-from database import events_collection, users_collection
-from services.ipfs_service import ipfs_service
-from datetime import datetime
-from bson import ObjectId
-from typing import Optional
+from repositories import events as events_repo
+from repositories import users as users_repo
+from repositories import checkins as checkins_repo
+from repositories import sales as sales_repo
+from repositories import images as images_repo
+from repositories import tickets as tickets_repo
+from repositories.pagination import encode_cursor, decode_cursor
+from services.ipfs_service import ipfs_service, UploadTooLarge
+from services.event_cache import event_cache
+from services.image_derivatives import image_derivative_service, pick_variant
+from services.ticket_manifest import build_manifest
+from services import hll
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import asyncio
+import json
+import os
 
 router = APIRouter(prefix="/events", tags=["events"])
 
+CHECKIN_STREAM_POLL_SECONDS = float(os.getenv("CHECKIN_STREAM_POLL_SECONDS", "2"))
+# Re-read buckets changed slightly before the last poll to absorb clock skew
+# between the servers writing them
+CHECKIN_STREAM_OVERLAP = timedelta(seconds=5)
+
+# Deltas re-send tickets changed slightly before since, for the same
+# clock-skew reason
+MANIFEST_SINCE_OVERLAP = timedelta(seconds=5)
+
+EVENT_FIELDS = {
+    "title", "description", "date", "venue", "image_url", "ticket_price",
+    "total_supply", "sold_count", "organizer_address", "created_at"
+}
+
+def _serialize_event(event: dict) -> dict:
+    event["_id"] = str(event["_id"])
+    # Seat holds are internal to minting; image variants are served by /image
+    event.pop("reservations", None)
+    event.pop("image_variants", None)
+    for field in ("date", "created_at", "updated_at"):
+        if field in event:
+            event[field] = event[field].isoformat()
+    return event
+
 @router.post("")
 async def create_event(
     title: str = Form(...),
@@ -19,16 +57,27 @@ async def create_event(
     organizer_address: str = Form(...),
     image: UploadFile = File(...)
 ):
-    user = users_collection.find_one({"wallet_address": organizer_address.lower()})
+    user = await users_repo.find_user_by_wallet(organizer_address)
     if not user or not user.get("is_organizer", False):
         raise HTTPException(status_code=403, detail="Only organizers can create events")
     
-    image_data = await image.read()
-    image_uri = await ipfs_service.upload_file(image_data, image.filename or "event_image.jpg")
+    try:
+        image_uri = await ipfs_service.upload_file(image.file, image.filename or "event_image.jpg")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
     if not image_uri:
         raise HTTPException(status_code=500, detail="Failed to upload image to IPFS")
     
+    # The upload left the spooled file at its end; render from the start
+    await image.seek(0)
+    try:
+        image_variants = await image_derivative_service.generate(image.file)
+    except Exception as e:
+        # The event still works; GET /events/{id}/image falls back to the original
+        print(f"Could not render derivatives of {image.filename}: {e}")
+        image_variants = None
+    
     event_data = {
         "title": title,
         "description": description,
@@ -38,34 +87,257 @@ async def create_event(
         "ticket_price": ticket_price,
         "total_supply": total_supply,
         "sold_count": 0,
+        "reserved_count": 0,
         "organizer_address": organizer_address.lower(),
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
     }
     
-    result = events_collection.insert_one(event_data)
+    if image_variants:
+        event_data["image_variants"] = image_variants
+    
+    result = await events_repo.insert_event(event_data)
     event_data["_id"] = str(result.inserted_id)
+    event_data.pop("image_variants", None)
+    event_cache.invalidate(event_data["_id"])
     
     return {"message": "Event created", "event_id": str(result.inserted_id), "event": event_data}
 
 @router.get("")
-async def get_events():
-    events = list(events_collection.find())
-    for event in events:
-        event["_id"] = str(event["_id"])
-        event["date"] = event["date"].isoformat()
-        event["created_at"] = event["created_at"].isoformat()
+async def get_events(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. title,date,venue,image_url"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    List events by date
+    
+    Pages hold up to `limit` events; when more may follow, the next page's
+    cursor is sent in the X-Next-Cursor header. `format=ndjson` streams every
+    event after the cursor, one JSON document per line, ignoring `limit`.
+    """
+    try:
+        after_key = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    projection = None
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - EVENT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown event fields: {', '.join(sorted(unknown))}")
+        projection = {field: 1 for field in requested}
+    
+    if format == "ndjson":
+        async def ndjson():
+            async for event in events_repo.events_cursor(after_key, projection):
+                yield json.dumps(_serialize_event(event)) + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    async def load_page():
+        events = await events_repo.list_events(limit, after_key, projection)
+        next_cursor = encode_cursor(events[-1]["date"], events[-1]["_id"]) if len(events) == limit else None
+        return [_serialize_event(event) for event in events], next_cursor
+    
+    page_key = (after, limit, tuple(sorted(projection)) if projection else None)
+    events, next_cursor = await event_cache.get_page(page_key, load_page)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
     return events
 
+def _checkin_summary(event_id: str, buckets: List[dict]) -> dict:
+    counts = Counter()
+    for bucket in buckets:
+        counts.update(bucket["counts"])
+    return {
+        "event_id": event_id,
+        "total": sum(bucket["total"] for bucket in buckets),
+        "counts": dict(counts),
+        "minutes": [
+            {"minute": bucket["minute"].isoformat(), "counts": bucket["counts"], "total": bucket["total"]}
+            for bucket in buckets
+        ]
+    }
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/{event_id}/checkins")
+async def get_event_checkins(event_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    Check-in counts of an event, per status and per minute
+    
+    Read from rollups kept up to date as verifications are written, so the
+    cost depends on the number of minutes asked for, not on scan volume.
+    """
+    buckets = await checkins_repo.find_checkins(event_id, since, until)
+    return _checkin_summary(event_id, buckets)
+
+@router.get("/{event_id}/checkins/stream")
+async def stream_event_checkins(event_id: str, request: Request):
+    """
+    Live check-in counts as Server-Sent Events
+    
+    Starts with a `snapshot` event shaped like GET /events/{id}/checkins, then
+    sends `delta` events whose per-minute counts are increments to add to it.
+    A comment line is sent when nothing changed to keep the connection open.
+    """
+    async def events():
+        buckets = await checkins_repo.find_checkins(event_id)
+        sent = {bucket["minute"]: Counter(bucket["counts"]) for bucket in buckets}
+        yield _sse("snapshot", _checkin_summary(event_id, buckets))
+        
+        last_poll = datetime.utcnow()
+        while not await request.is_disconnected():
+            await asyncio.sleep(CHECKIN_STREAM_POLL_SECONDS)
+            poll_started = datetime.utcnow()
+            changed = await checkins_repo.find_checkins(event_id, updated_since=last_poll - CHECKIN_STREAM_OVERLAP)
+            last_poll = poll_started
+            
+            deltas = []
+            for bucket in changed:
+                counts = Counter(bucket["counts"])
+                increments = counts - sent.get(bucket["minute"], Counter())
+                if increments:
+                    sent[bucket["minute"]] = counts
+                    deltas.append({
+                        "minute": bucket["minute"].isoformat(),
+                        "counts": dict(increments),
+                        "total": sum(increments.values())
+                    })
+            
+            if deltas:
+                yield _sse("delta", {
+                    "event_id": event_id,
+                    "total": sum(delta["total"] for delta in deltas),
+                    "minutes": deltas
+                })
+            else:
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{event_id}/analytics")
+async def get_event_analytics(event_id: str):
+    """
+    Sales of an event over time
+    
+    Answered from rollups updated at each mint: tickets sold, revenue and
+    estimated unique buyers (HyperLogLog, about 3% error), in total and per hour.
+    """
+    rollups = await sales_repo.find_sales(event_id)
+    total = next((rollup for rollup in rollups if rollup["hour"] is None), {})
+    
+    return {
+        "event_id": event_id,
+        "tickets_sold": total.get("tickets", 0),
+        "revenue": total.get("revenue", 0),
+        "unique_buyers": hll.estimate(total.get("buyers", {})),
+        "hourly": [
+            {
+                "hour": rollup["hour"].isoformat(),
+                "tickets_sold": rollup["tickets"],
+                "revenue": rollup["revenue"],
+                "unique_buyers": hll.estimate(rollup.get("buyers", {}))
+            }
+            for rollup in rollups
+            if rollup["hour"] is not None
+        ]
+    }
+
+@router.get("/{event_id}/manifest")
+async def get_event_manifest(event_id: str, since: Optional[datetime] = None):
+    """
+    Signed ticket manifest for offline validators (application/cbor)
+    
+    Lists each ticket's token ID, owner, redemption time and photo CID in a
+    columnar CBOR layout (see services/ticket_manifest.py), signed with the
+    key from GET /verify/credential-key. With `since`, only tickets changed
+    since then are included; pass the previous manifest's generated_at
+    (also sent in X-Manifest-Generated-At) to stay in sync.
+    """
+    try:
+        event = await event_cache.get_event(event_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid event ID")
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if since and since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # Read the clock before the tickets, so a ticket written during the
+    # read is included again in the next delta rather than skipped
+    generated_at = datetime.utcnow()
+    tickets = await tickets_repo.event_tickets_cursor(
+        event_id, since - MANIFEST_SINCE_OVERLAP if since else None
+    ).to_list(length=None)
+    
+    return Response(
+        build_manifest(event_id, tickets, generated_at, since),
+        media_type="application/cbor",
+        headers={"X-Manifest-Generated-At": generated_at.isoformat() + "Z", "Cache-Control": "no-store"}
+    )
+
+@router.get("/{event_id}/image")
+async def get_event_image(
+    event_id: str,
+    request: Request,
+    w: int = Query(640, ge=1, le=4096, description="Width the image is displayed at, in pixels"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$", description="Defaults to webp when the Accept header allows it")
+):
+    """
+    Event image resized for display
+    
+    Serves the narrowest stored variant at least `w` pixels wide. Variants
+    never change once rendered, so responses carry their sha256 as a strong
+    ETag and may be cached forever. Events whose variants have not been
+    rendered yet redirect to the original on the IPFS gateway.
+    """
+    try:
+        event = await event_cache.get_event(event_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid event ID")
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if not format:
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    variant = pick_variant(event.get("image_variants"), w, format)
+    if not variant:
+        original_url = ipfs_service.get_ipfs_url(event.get("image_url", ""))
+        if not original_url:
+            raise HTTPException(status_code=404, detail="Event has no image")
+        return RedirectResponse(original_url, status_code=307, headers={"Cache-Control": "no-cache"})
+    
+    headers = {
+        "ETag": f'"{variant["sha256"]}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept"
+    }
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    image = await images_repo.find_image(variant["sha256"])
+    if not image:
+        raise HTTPException(status_code=404, detail="Image variant missing")
+    return Response(bytes(image["data"]), media_type=image["content_type"], headers=headers)
+
 @router.get("/{event_id}")
 async def get_event(event_id: str):
     try:
-        event = events_collection.find_one({"_id": ObjectId(event_id)})
+        event = await event_cache.get_event(event_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
         
-        event["_id"] = str(event["_id"])
-        event["date"] = event["date"].isoformat()
-        event["created_at"] = event["created_at"].isoformat()
-        return event
+        return _serialize_event(event)
     except:
         raise HTTPException(status_code=400, detail="Invalid event ID")
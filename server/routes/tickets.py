@@ -1,99 +1,326 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from models.ticket import TicketMintRequest
-from database import tickets_collection, events_collection
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo.errors import DuplicateKeyError
+from models.ticket import TicketMintRequest, BulkMintRequest
+from repositories import events as events_repo
+from repositories import tickets as tickets_repo
+from repositories import orders as orders_repo
+from repositories import users as users_repo
 from services.blockchain import blockchain_service
-from services.ipfs_service import ipfs_service
+from services.inventory import inventory_service
+from services.event_cache import event_cache
+from services.ipfs_service import ipfs_service, UploadTooLarge
+from services.ticket_credential import qr_code_data
+from services.mint_orders import mint_order_service, ticket_metadata, record_sale
+from collections import Counter
 from datetime import datetime
-from bson import ObjectId
+from typing import Optional
+import asyncio
 import json
+import os
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
-@router.post("/mint")
+# Largest buyer photo accepted, enforced while the upload streams in
+MINT_MAX_IMAGE_BYTES = int(os.getenv("MINT_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MINT_ORDER_POLL_SECONDS = float(os.getenv("MINT_ORDER_POLL_SECONDS", "1"))
+# Tickets per mintBatch transaction; keeps each one well under the block gas limit
+MINT_BATCH_SIZE = int(os.getenv("MINT_BATCH_SIZE", "100"))
+MINT_BULK_MAX_TICKETS = int(os.getenv("MINT_BULK_MAX_TICKETS", "1000"))
+
+def _serialize_order(order: dict) -> dict:
+    serialized = {
+        "order_id": str(order["_id"]),
+        "event_id": order["event_id"],
+        "wallet_address": order["wallet_address"],
+        "status": order["status"],
+        "stage": order["stage"],
+        "history": [{"stage": entry["stage"], "at": entry["at"].isoformat()} for entry in order["history"]],
+        "created_at": order["created_at"].isoformat(),
+        "updated_at": order["updated_at"].isoformat()
+    }
+    for field in ("token_id", "tx_hash", "metadata_uri", "qr_code_data", "error"):
+        if field in order:
+            serialized[field] = order[field]
+    return serialized
+
+def _existing_order(order: dict, event_id: str, wallet_address: str, response: Response) -> dict:
+    if order["event_id"] != event_id or order["wallet_address"] != wallet_address.lower():
+        raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different purchase")
+    response.headers["Location"] = f"/tickets/orders/{order['_id']}"
+    return _serialize_order(order)
+
+@router.post("/mint", status_code=202)
 async def mint_ticket(
+    response: Response,
     event_id: str = Form(...),
     wallet_address: str = Form(...),
-    buyer_image: UploadFile = File(...)
+    buyer_image: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    event = events_collection.find_one({"_id": ObjectId(event_id)})
+    """
+    Order a ticket
+    
+    Holds a seat and queues the order for minting, returning 202 with the
+    order at once; follow it at the Location URL or its /stream. Retrying with
+    the same Idempotency-Key returns the original order instead of buying twice.
+    """
+    if idempotency_key:
+        existing = await orders_repo.find_order_by_key(idempotency_key)
+        if existing:
+            return _existing_order(existing, event_id, wallet_address, response)
+    
+    if inventory_service.is_sold_out(event_id):
+        raise HTTPException(status_code=409, detail="Event sold out")
+    
+    event = await event_cache.get_event(event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    if event["sold_count"] >= event["total_supply"]:
-        raise HTTPException(status_code=400, detail="Event sold out")
-    
-    image_data = await buyer_image.read()
-    buyer_image_uri = await ipfs_service.upload_file(image_data, buyer_image.filename or "buyer_image.jpg")
+    # Hold a seat before touching the photo, so a sold out event never
+    # spools or pins it; the order releases the seat if minting fails
+    reservation_id = await inventory_service.reserve(event_id)
+    if not reservation_id:
+        raise HTTPException(status_code=409, detail="Event sold out")
     
+    # Streamed to the pin spool chunk by chunk, never read into memory whole
+    try:
+        buyer_image_uri = await ipfs_service.upload_file(
+            buyer_image.file,
+            buyer_image.filename or "buyer_image.jpg",
+            MINT_MAX_IMAGE_BYTES
+        )
+    except UploadTooLarge:
+        await inventory_service.release(event_id, reservation_id)
+        raise HTTPException(status_code=413, detail=f"Buyer image exceeds {MINT_MAX_IMAGE_BYTES} bytes")
+    except BaseException:
+        await inventory_service.release(event_id, reservation_id)
+        raise
     if not buyer_image_uri:
+        await inventory_service.release(event_id, reservation_id)
         raise HTTPException(status_code=500, detail="Failed to upload buyer image")
     
-    metadata = {
-        "name": f"{event['title']} - Ticket",
-        "description": f"NFT Ticket for {event['title']} at {event['venue']}",
-        "image": buyer_image_uri,
-        "attributes": [
-            {"trait_type": "Event", "value": event["title"]},
-            {"trait_type": "Venue", "value": event["venue"]},
-            {"trait_type": "Date", "value": event["date"].isoformat()},
-            {"trait_type": "Price", "value": str(event["ticket_price"])}
-        ],
-        "event_id": event_id,
-        "buyer_address": wallet_address.lower()
-    }
+    try:
+        order = await mint_order_service.submit(
+            event_id,
+            wallet_address,
+            reservation_id,
+            buyer_image_uri,
+            idempotency_key
+        )
+    except DuplicateKeyError:
+        # A concurrent retry with the same key won the race
+        await inventory_service.release(event_id, reservation_id)
+        existing = await orders_repo.find_order_by_key(idempotency_key)
+        return _existing_order(existing, event_id, wallet_address, response)
+    except BaseException:
+        await inventory_service.release(event_id, reservation_id)
+        raise
+    
+    response.headers["Location"] = f"/tickets/orders/{order['_id']}"
+    return _serialize_order(order)
+
+@router.post("/mint/bulk")
+async def mint_bulk(request: BulkMintRequest):
+    """
+    Mint group or comp tickets for many wallets (organizer only)
     
-    metadata_uri = await ipfs_service.upload_json(metadata)
+    Tickets are minted MINT_BATCH_SIZE per transaction. Each chunk holds its
+    own seats, so a failed chunk gives its seats back without undoing the
+    chunks minted before it. When the event runs out of seats, the chunks
+    that fit are still minted. The response lists minted recipients (with an
+    "error" if the ticket could not be saved) and failed ones, each with a
+    status of "failed" (minting failed or no token reported) or "sold_out"
+    (no seat left).
+    """
+    recipients = request.recipients
+    if not recipients:
+        raise HTTPException(status_code=400, detail="No recipients")
+    if len(recipients) > MINT_BULK_MAX_TICKETS:
+        raise HTTPException(status_code=400, detail=f"Too many recipients: {len(recipients)} (max {MINT_BULK_MAX_TICKETS})")
     
-    if not metadata_uri:
-        raise HTTPException(status_code=500, detail="Failed to upload metadata")
+    user = await users_repo.find_user_by_wallet(request.organizer_address)
+    if not user or not user.get("is_organizer", False):
+        raise HTTPException(status_code=403, detail="Only organizers can bulk mint tickets")
     
-    mint_result = await blockchain_service.mint_ticket(wallet_address, metadata_uri)
+    event_id = request.event_id
+    event = await event_cache.get_event(event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if event.get("organizer_address") != request.organizer_address.lower():
+        raise HTTPException(status_code=403, detail="Only the event's organizer can bulk mint its tickets")
     
-    if not mint_result.get("success"):
-        raise HTTPException(status_code=500, detail=f"Minting failed: {mint_result.get('error')}")
+    # Hold seats for as many chunks as the event can supply before minting
+    # anything; recipients past the last held chunk are reported sold out
+    reservations = []
+    failed = []
+    for start in range(0, len(recipients), MINT_BATCH_SIZE):
+        chunk = recipients[start:start + MINT_BATCH_SIZE]
+        reservation_id = await inventory_service.reserve(event_id, len(chunk))
+        if not reservation_id:
+            failed.extend(
+                {"wallet_address": recipient.wallet_address.lower(), "status": "sold_out", "error": "Not enough seats left"}
+                for recipient in recipients[start:]
+            )
+            break
+        reservations.append((reservation_id, chunk))
+    if not reservations:
+        raise HTTPException(status_code=400, detail=f"Not enough seats left for {len(recipients)} tickets")
     
-    qr_data = json.dumps({
-        "token_id": mint_result["token_id"],
-        "event_id": event_id,
-        "metadata_uri": metadata_uri
-    })
+    async with inventory_service.held(event_id, *[reservation_id for reservation_id, _ in reservations]):
+        minted = await _mint_chunks(event_id, event, request.ticket_price, reservations, failed)
     
-    ticket_data = {
-        "token_id": mint_result["token_id"],
-        "event_id": event_id,
-        "owner_address": wallet_address.lower(),
-        "metadata_uri": metadata_uri,
-        "qr_code_data": qr_data,
-        "tx_hash": mint_result["tx_hash"],
-        "minted_at": datetime.utcnow()
+    return {
+        "message": f"Minted {len(minted)} of {len(recipients)} tickets",
+        "minted": minted,
+        "failed": failed
     }
+
+async def _mint_chunks(event_id: str, event: dict, ticket_price: float, reservations: list, failed: list) -> list:
+    # Mints each held chunk in its own transaction, committing or releasing
+    # its seats; recipients of failed chunks, and recipients a successful
+    # batch reported no token for, are appended to failed
+    minted = []
+    for index, (reservation_id, chunk) in enumerate(reservations):
+        wallet_addresses = [recipient.wallet_address.lower() for recipient in chunk]
+        try:
+            metadata_uris = await asyncio.gather(*[
+                ipfs_service.upload_json(ticket_metadata(
+                    event, event_id, recipient.wallet_address,
+                    recipient.image_uri or event["image_url"], ticket_price
+                ))
+                for recipient in chunk
+            ])
+            if not all(metadata_uris):
+                raise Exception("Failed to upload metadata")
+            
+            mint_result = await blockchain_service.mint_batch(wallet_addresses, metadata_uris)
+            if not mint_result.get("success"):
+                raise Exception(f"Minting failed: {mint_result.get('error')}")
+        except Exception as e:
+            await inventory_service.release(event_id, reservation_id, len(chunk))
+            failed.extend({"wallet_address": address, "status": "failed", "error": str(e)} for address in wallet_addresses)
+            continue
+        except BaseException:
+            for held_id, held in reservations[index:]:
+                await inventory_service.release(event_id, held_id, len(held))
+            raise
+        
+        # TicketMinted events come in recipient order
+        tickets = []
+        now = datetime.utcnow()
+        for recipient, metadata_uri, token_id in zip(chunk, metadata_uris, mint_result["token_ids"]):
+            image_uri = recipient.image_uri or event["image_url"]
+            tickets.append({
+                "token_id": token_id,
+                "event_id": event_id,
+                "owner_address": recipient.wallet_address.lower(),
+                "metadata_uri": metadata_uri,
+                "image_uri": image_uri,
+                "qr_code_data": qr_code_data(token_id, event_id, metadata_uri, image_uri),
+                "tx_hash": mint_result["tx_hash"],
+                "minted_at": now,
+                "updated_at": now
+            })
+        # The transaction succeeded, so a recipient without a reported token
+        # may still hold one; the whole chunk's seats count as sold and the
+        # organizer has to check the transaction before minting them again
+        failed.extend(
+            {
+                "wallet_address": address,
+                "status": "failed",
+                "error": f"Batch {mint_result['tx_hash']} reported no token for this recipient; check the transaction before retrying"
+            }
+            for address in wallet_addresses[len(tickets):]
+        )
+        
+        # Tokens exist on chain from here on, so the seats are sold and the
+        # tickets are reported even if saving them fails
+        save_error = None
+        try:
+            await inventory_service.commit(event_id, reservation_id, len(chunk))
+            for wallet_address, quantity in Counter(wallet_addresses).items():
+                await record_sale(event_id, wallet_address, ticket_price, quantity)
+            if tickets:
+                await tickets_repo.insert_tickets(tickets)
+        except Exception as e:
+            print(f"Could not save batch {mint_result['tx_hash']}: {e}")
+            save_error = f"Minted but not saved: {e}"
+        
+        for ticket in tickets:
+            entry = {
+                "wallet_address": ticket["owner_address"],
+                "token_id": ticket["token_id"],
+                "tx_hash": ticket["tx_hash"],
+                "qr_code_data": ticket["qr_code_data"]
+            }
+            if save_error:
+                entry["error"] = save_error
+            minted.append(entry)
     
-    tickets_collection.insert_one(ticket_data)
+    return minted
+
+@router.get("/orders/{order_id}")
+async def get_mint_order(order_id: str):
+    order = await orders_repo.find_order(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
     
-    events_collection.update_one(
-        {"_id": ObjectId(event_id)},
-        {"$inc": {"sold_count": 1}}
-    )
+    return _serialize_order(order)
+
+@router.get("/orders/{order_id}/stream")
+async def stream_mint_order(order_id: str, request: Request):
+    """
+    Mint order progress as Server-Sent Events
     
-    return {
-        "message": "Ticket minted successfully",
-        "token_id": mint_result["token_id"],
-        "tx_hash": mint_result["tx_hash"],
-        "qr_code_data": qr_data,
-        "metadata_uri": metadata_uri
-    }
+    Sends a `stage` event with the whole order each time it enters a stage,
+    ending after the `completed` or `failed` stage.
+    """
+    order = await orders_repo.find_order(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    async def events(order: dict):
+        sent = 0
+        while True:
+            if len(order["history"]) > sent:
+                sent = len(order["history"])
+                yield f"event: stage\ndata: {json.dumps(_serialize_order(order))}\n\n"
+            else:
+                yield ": keepalive\n\n"
+            
+            if order["status"] in ("completed", "failed") or await request.is_disconnected():
+                return
+            await asyncio.sleep(MINT_ORDER_POLL_SECONDS)
+            order = await orders_repo.find_order(order_id)
+    
+    return StreamingResponse(
+        events(order),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{wallet_address}")
-async def get_user_tickets(wallet_address: str):
+async def get_user_tickets(
+    wallet_address: str,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
     blockchain_tickets = await blockchain_service.get_tickets_of_owner(wallet_address)
     
-    tickets = list(tickets_collection.find({"owner_address": wallet_address.lower()}))
+    tickets = await tickets_repo.find_tickets_by_owner(wallet_address, skip, limit)
+    
+    # One batched lookup for every event referenced on this page
+    events = await events_repo.find_events_by_ids(
+        {ticket["event_id"] for ticket in tickets},
+        projection={"title": 1, "venue": 1, "date": 1}
+    )
     
     for ticket in tickets:
         ticket["_id"] = str(ticket["_id"])
         ticket["minted_at"] = ticket["minted_at"].isoformat()
         
-        event = events_collection.find_one({"_id": ObjectId(ticket["event_id"])})
+        event = events.get(ticket["event_id"])
         if event:
             ticket["event"] = {
                 "title": event["title"],
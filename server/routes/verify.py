@@ -1,57 +1,178 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from database import verifications_collection, tickets_collection
-from services.ai_verify import ai_verify_service
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from repositories import tickets as tickets_repo
+from repositories import verifications as verifications_repo
+from repositories.pagination import encode_cursor, decode_cursor
+from services.ai_verify import ai_verify_service, VERIFY_MAX_IMAGE_BYTES
+from services.admission import admission_controller, AdmissionRejected, granted_priority, is_gate_key
+from services.verify_ledger import verification_ledger
+from services.record_writer import verification_writer
 from services.blockchain import blockchain_service
+from services.redemptions import redemption_service
+from services.ticket_credential import ticket_credentials, is_credential, InvalidCredential, PREFIX
 from datetime import datetime
+from typing import Awaitable, BinaryIO, Callable, List, Optional, Union
+import asyncio
 import json
+import os
+import time
 
 router = APIRouter(prefix="/verify", tags=["verify"])
 
-@router.post("")
-async def verify_ticket(
-    qr_data: str = Form(...),
-    selfie: UploadFile = File(...)
-):
-    try:
-        print(f"Verification request - QR data length: {len(qr_data)}")
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", "32"))
+# Attendees one WebSocket connection may have in verification at once
+VERIFY_WS_MAX_IN_FLIGHT = int(os.getenv("VERIFY_WS_MAX_IN_FLIGHT", "8"))
+
+ALREADY_REDEEMED = "Ticket has already been used"
+SELFIE_TOO_LARGE = f"Selfie exceeds {VERIFY_MAX_IMAGE_BYTES} bytes"
+
+def _deadline(timeout: Optional[float]) -> Optional[float]:
+    # Clients send how long they will wait (X-Request-Timeout) rather than an
+    # absolute time so device clock skew does not matter
+    return time.time() + timeout if timeout else None
+
+def _selfie_size(selfie: Union[bytes, BinaryIO]) -> int:
+    if isinstance(selfie, bytes):
+        return len(selfie)
+    # Spooled upload: measure without reading it into memory
+    size = selfie.seek(0, os.SEEK_END)
+    selfie.seek(0)
+    return size
+
+async def _verify_one(
+    qr_data: str,
+    selfie_data: Union[bytes, BinaryIO],
+    on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+    gate_id: str = "default",
+    priority: str = "normal",
+    deadline: Optional[float] = None
+) -> dict:
+    print(f"Verification request - QR data length: {len(qr_data)}")
+    metadata_uri = None
+    image_uri = None
+    if is_credential(qr_data):
+        # Signed by this server at mint time, so the photo it names can be
+        # trusted without reading the token URI or metadata
+        try:
+            credential = ticket_credentials.verify(qr_data)
+        except InvalidCredential as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        token_id = credential.token_id
+        event_id = credential.event_id
+        image_uri = credential.image_uri
+        print(f"Using credential image URI: {image_uri}")
+    else:
         qr_info = json.loads(qr_data)
         token_id = qr_info.get("token_id")
         metadata_uri = qr_info.get("metadata_uri")
-        
+
         if not token_id:
             raise HTTPException(status_code=400, detail="Missing token_id in QR code data")
-        
+
+        # The JSON payload is unsigned, so its event_id could name any event;
+        # check-ins are counted against the event the ticket was minted for
+        event_id = await tickets_repo.find_ticket_event_id(token_id)
+
+    # Re-entry is refused from memory, before any chain, IPFS or AI work
+    if redemption_service.is_redeemed(token_id):
+        return _verdict(token_id, event_id, {"verified": False, "status": "already_redeemed", "reason": ALREADY_REDEEMED})
+
+    # Checked before the token URI lookup so an oversize upload costs no chain RPC
+    selfie_size = _selfie_size(selfie_data)
+    print(f"Selfie uploaded: {selfie_size} bytes")
+
+    if selfie_size > VERIFY_MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=SELFIE_TOO_LARGE)
+
+    if not image_uri:
         if metadata_uri is None:
             print(f"Metadata URI not in QR, fetching from blockchain for token {token_id}")
-            metadata_uri = blockchain_service.get_token_uri(token_id)
-        
+            metadata_uri = await asyncio.to_thread(blockchain_service.get_token_uri, token_id)
+
         if not metadata_uri:
             raise HTTPException(status_code=400, detail=f"Could not find metadata URI for token {token_id}. Make sure the ticket was minted correctly.")
-        
+
         print(f"Using metadata URI: {metadata_uri}")
-        selfie_data = await selfie.read()
-        print(f"Selfie uploaded: {len(selfie_data)} bytes")
-        
-        verification_result = await ai_verify_service.verify_selfie(selfie_data, metadata_uri)
-        print(f"Verification result: {verification_result}")
-        
-        verification_record = {
-            "token_id": token_id,
-            "status": verification_result["status"],
-            "verified": verification_result["verified"],
-            "reason": verification_result.get("reason", ""),
-            "verified_at": datetime.utcnow()
-        }
-        
-        verifications_collection.insert_one(verification_record)
-        
-        return {
-            "verified": verification_result["verified"],
-            "status": verification_result["status"],
-            "message": verification_result.get("reason", ""),
-            "confidence": verification_result.get("confidence", "unknown")
-        }
-        
+
+    if on_stage:
+        await on_stage("precheck_passed")
+
+    async with admission_controller.slot(gate_id, priority, deadline):
+        verification_result = await ai_verify_service.verify_selfie(selfie_data, metadata_uri, on_stage, image_uri)
+    print(f"Verification result: {verification_result}")
+
+    if verification_result["verified"]:
+        # Another gate may have admitted the same ticket while this one was
+        # being checked; only one redemption can succeed
+        refused = await redemption_service.redeem(token_id, gate_id)
+        if refused == "already_redeemed":
+            verification_result = {**verification_result, "verified": False, "status": "already_redeemed", "reason": ALREADY_REDEEMED}
+        elif refused == "not_found":
+            verification_result = {**verification_result, "verified": False, "status": "error", "reason": f"Ticket {token_id} not found"}
+
+    return _verdict(token_id, event_id, verification_result)
+
+def _verdict(token_id: int, event_id: Optional[str], verification_result: dict) -> dict:
+    verification_record = {
+        "token_id": token_id,
+        "event_id": event_id,
+        "status": verification_result["status"],
+        "verified": verification_result["verified"],
+        "reason": verification_result.get("reason", ""),
+        "metrics": verification_result.get("metrics"),
+        "verified_at": datetime.utcnow()
+    }
+
+    # Written in the background so the gate is not kept waiting on the DB
+    verification_writer.add(verification_record)
+
+    return {
+        "verified": verification_result["verified"],
+        "status": verification_result["status"],
+        "message": verification_result.get("reason", ""),
+        "confidence": verification_result.get("confidence", "unknown")
+    }
+
+async def _verify_item(
+    qr_data: str,
+    selfie_data: Union[bytes, BinaryIO],
+    on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+    **admission
+) -> dict:
+    # Like _verify_one, but reports failures in the result instead of raising,
+    # for channels that carry many verifications at once
+    try:
+        return await _verify_one(qr_data, selfie_data, on_stage, **admission)
+    except AdmissionRejected as e:
+        return {"verified": False, "status": "error", "message": str(e), "retry_after": e.retry_after}
+    except json.JSONDecodeError as e:
+        return {"verified": False, "status": "error", "message": f"Invalid QR code data format. Expected JSON: {str(e)}"}
+    except HTTPException as e:
+        return {"verified": False, "status": "error", "message": e.detail}
+    except Exception as e:
+        print(f"Verification error: {e}")
+        return {"verified": False, "status": "error", "message": f"Verification failed: {str(e)}"}
+
+@router.post("")
+async def verify_ticket(
+    qr_data: str = Form(...),
+    selfie: UploadFile = File(...),
+    x_gate_id: str = Header("default"),
+    x_scan_priority: str = Header("normal"),
+    x_gate_key: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None)
+):
+    try:
+        return await _verify_one(
+            qr_data,
+            selfie.file,
+            gate_id=x_gate_id,
+            priority=granted_priority(x_scan_priority, is_gate_key(x_gate_key)),
+            deadline=_deadline(x_request_timeout)
+        )
+
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except json.JSONDecodeError as e:
         print(f"JSON decode error: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid QR code data format. Expected JSON: {str(e)}")
@@ -63,19 +184,190 @@ async def verify_ticket(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
 
+@router.post("/batch")
+async def verify_batch(
+    qr_data: List[str] = Form(...),
+    selfie: List[UploadFile] = File(...),
+    stream: bool = False,
+    x_gate_id: str = Header("default"),
+    x_scan_priority: str = Header("normal"),
+    x_gate_key: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None)
+):
+    """
+    Verify several attendees in one request.
+
+    `qr_data` and `selfie` are repeated multipart fields paired by position.
+    Items run concurrently under the provider concurrency limit. Results are
+    returned as one array, or as NDJSON lines in completion order when
+    `stream=true`. Each result carries the `index` of its pair.
+    """
+    if len(qr_data) != len(selfie):
+        raise HTTPException(status_code=400, detail=f"Got {len(qr_data)} qr_data fields but {len(selfie)} selfies")
+
+    if len(qr_data) > VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(qr_data)} items (max {VERIFY_BATCH_MAX_ITEMS})")
+
+    deadline = _deadline(x_request_timeout)
+    priority = granted_priority(x_scan_priority, is_gate_key(x_gate_key))
+
+    # Uploads are closed once this handler returns, so a streamed response
+    # has to take its selfies into memory first; oversize ones are measured
+    # on disk and never read (None)
+    if stream:
+        selfies = [
+            None if _selfie_size(upload.file) > VERIFY_MAX_IMAGE_BYTES else await upload.read()
+            for upload in selfie
+        ]
+    else:
+        selfies = [upload.file for upload in selfie]
+
+    async def run(index: int) -> dict:
+        if selfies[index] is None:
+            return {"index": index, "verified": False, "status": "error", "message": SELFIE_TOO_LARGE}
+        result = await _verify_item(
+            qr_data[index],
+            selfies[index],
+            gate_id=x_gate_id,
+            priority=priority,
+            deadline=deadline
+        )
+        return {"index": index, **result}
+
+    tasks = [asyncio.ensure_future(run(index)) for index in range(len(qr_data))]
+
+    if not stream:
+        return {"results": await asyncio.gather(*tasks)}
+
+    async def ndjson():
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield json.dumps(await completed) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.websocket("/ws")
+async def verify_socket(websocket: WebSocket):
+    """
+    Long-lived verification channel for validator devices.
+
+    For each attendee the device sends a text frame `{"id": ..., "qr_data": ...}`
+    followed by one binary frame with the selfie. The server answers with
+    `{"type": "stage", "id", "stage"}` messages (received, precheck_passed,
+    fetched, provider_pending) and a final `{"type": "verdict", "id", ...}`.
+    Up to VERIFY_WS_MAX_IN_FLIGHT attendees may be in flight at once; match
+    replies by `id`. Past that, no further frames are read until one of them
+    finishes, so the device is slowed down rather than refused.
+    The gate is taken from the `gate_id` query parameter. On a connection
+    opened with a gate key (`gate_key` query parameter or X-Gate-Key header),
+    a frame may carry `"priority": "vip"` or `"rescan"` to jump the queue.
+    """
+    gate_id = websocket.query_params.get("gate_id", "default")
+    trusted = is_gate_key(websocket.query_params.get("gate_key") or websocket.headers.get("x-gate-key"))
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(VERIFY_WS_MAX_IN_FLIGHT)
+    tasks = set()
+    pending = None
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def run(request_id, qr_data: str, priority: str, selfie_data: bytes):
+        async def on_stage(stage: str):
+            await send({"type": "stage", "id": request_id, "stage": stage})
+
+        try:
+            await on_stage("received")
+            result = await _verify_item(qr_data, selfie_data, on_stage, gate_id=gate_id, priority=priority)
+            await send({"type": "verdict", "id": request_id, **result})
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("text") is not None:
+                try:
+                    payload = json.loads(message["text"])
+                    pending = (payload.get("id"), payload["qr_data"], granted_priority(payload.get("priority", "normal"), trusted))
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                    await send({"type": "error", "message": "Expected a JSON text frame with qr_data"})
+            elif message.get("bytes") is not None:
+                if pending is None:
+                    await send({"type": "error", "message": "Send the qr_data frame before the selfie"})
+                    continue
+                request_id, qr_data, priority = pending
+                pending = None
+                await slots.acquire()
+                task = asyncio.create_task(run(request_id, qr_data, priority, message["bytes"]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.get("/credential-key")
+async def get_credential_key():
+    """
+    Public key that signs ticket credentials ("TK1:" QR codes)
+
+    Validators holding it can check a credential's signature offline.
+    """
+    public_key = ticket_credentials.public_key_base64()
+    if not public_key:
+        raise HTTPException(status_code=404, detail="Ticket credentials are not enabled")
+    return {"algorithm": "Ed25519", "public_key": public_key, "prefix": PREFIX}
+
+@router.get("/stats")
+async def get_verification_stats():
+    """
+    Rolling per-provider verification statistics
+
+    Returns:
+        Call counts, status mix, per-stage latency percentiles, payload sizes
+        and token usage over the most recent calls of each provider
+    """
+    return verification_ledger.stats()
+
 @router.get("/logs")
-async def get_verification_logs():
-    logs = list(verifications_collection.find().sort("verified_at", -1).limit(50))
+async def get_verification_logs(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    event_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    try:
+        after_key = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logs = await verifications_repo.find_verifications(limit, after_key, event_id, status, since, until)
+    
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1]["verified_at"], logs[-1]["_id"])
     
     for log in logs:
         log["_id"] = str(log["_id"])
         log["verified_at"] = log["verified_at"].isoformat()
         
-        ticket = tickets_collection.find_one({"token_id": log["token_id"]})
+        ticket = log.pop("ticket")
         if ticket:
             log["ticket_info"] = {
-                "event_id": ticket.get("event_id"),
-                "owner_address": ticket.get("owner_address")
+                "event_id": ticket[0].get("event_id"),
+                "owner_address": ticket[0].get("owner_address")
             }
     
     return logs
@@ -0,0 +1,84 @@
+"""
+Event Image Derivative Backfill
+Renders the image derivatives of events created before they existed (or of
+every event with --all, e.g. after changing IMAGE_DERIVATIVE_WIDTHS). Each
+original is downloaded from the IPFS gateway into a spooled temporary file.
+
+Usage (from the server directory):
+    python -m scripts.backfill_event_images [--all] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import tempfile
+
+import httpx
+
+from repositories import events as events_repo
+from services.image_derivatives import image_derivative_service
+from services.ipfs_service import ipfs_service, IPFS_MAX_UPLOAD_BYTES
+
+# Originals up to this size stay in memory; larger ones spill to disk
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+async def _download(client: httpx.AsyncClient, url: str) -> tempfile.SpooledTemporaryFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > IPFS_MAX_UPLOAD_BYTES:
+                spooled.close()
+                raise ValueError(f"Image exceeds {IPFS_MAX_UPLOAD_BYTES} bytes")
+            spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+async def _backfill_event(client: httpx.AsyncClient, event: dict) -> str:
+    url = ipfs_service.get_ipfs_url(event.get("image_url", ""))
+    if not url:
+        return "skipped"
+    with await _download(client, url) as original:
+        variants = await image_derivative_service.generate(original)
+    await events_repo.set_image_variants(str(event["_id"]), variants)
+    return "rendered"
+
+
+async def backfill(include_existing: bool, concurrency: int):
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(client: httpx.AsyncClient, event: dict):
+        async with limit:
+            try:
+                counts[await _backfill_event(client, event)] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"✗ Event {event['_id']}: {e}")
+
+    async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
+        tasks = []
+        async for event in events_repo.events_missing_image_variants_cursor(include_existing):
+            tasks.append(asyncio.create_task(run(client, event)))
+            # Keep at most a window of pending tasks, not one per event
+            if len(tasks) >= concurrency * 4:
+                await asyncio.gather(*tasks)
+                tasks = []
+        await asyncio.gather(*tasks)
+
+    print(f"Rendered {counts['rendered']}, skipped {counts['skipped']} without a fetchable image, {counts['failed']} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Re-render events that already have derivatives")
+    parser.add_argument("--concurrency", type=int, default=4, help="Images downloaded and rendered at once")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.all, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Admission Control for AI Verification
+Bounds the number of verifications in flight per worker and queues the rest:
+- Higher priority lanes (VIP, re-scans) are always served first; only
+  callers presenting a gate key (VERIFY_GATE_KEYS) may ask for them
+- Within a priority, gates are served round-robin so one busy gate cannot starve the others
+- Waiters whose client deadline has passed are dropped instead of served
+- Requests are rejected up front once the expected queue wait exceeds the budget
+"""
+
+import asyncio
+import hmac
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+VERIFY_MAX_INFLIGHT = int(os.getenv("VERIFY_MAX_INFLIGHT", os.getenv("AI_MAX_CONCURRENCY", "4")))
+VERIFY_MAX_QUEUE = int(os.getenv("VERIFY_MAX_QUEUE", "64"))
+VERIFY_QUEUE_BUDGET_SECONDS = float(os.getenv("VERIFY_QUEUE_BUDGET_SECONDS", "10"))
+
+# Comma-separated keys issued to gate devices and staff
+VERIFY_GATE_KEYS = [key.strip() for key in os.getenv("VERIFY_GATE_KEYS", "").split(",") if key.strip()]
+
+# Lower level is served first
+PRIORITIES = {"vip": 0, "rescan": 0, "normal": 1}
+
+
+def is_gate_key(gate_key: Optional[str]) -> bool:
+    """True if gate_key is one of VERIFY_GATE_KEYS"""
+    if not gate_key:
+        return False
+    presented = gate_key.encode()
+    return any(hmac.compare_digest(presented, key.encode()) for key in VERIFY_GATE_KEYS)
+
+
+def granted_priority(requested: str, trusted: bool) -> str:
+    """
+    Priority a caller is served at
+
+    Args:
+        requested: Priority the caller asked for
+        trusted: Whether the caller presented a gate key
+
+    Returns:
+        requested for gate and staff callers, "normal" for anyone else
+    """
+    return requested if trusted else "normal"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a verification cannot start within the queue wait budget"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized, per-gate fair queue in front of AI verification
+    """
+
+    def __init__(self, capacity: int, max_queue: int, wait_budget: float):
+        """
+        Initialize admission controller
+
+        Args:
+            capacity: Verifications allowed to run at once
+            max_queue: Verifications allowed to wait for a slot
+            wait_budget: Longest expected queue wait (seconds) before rejecting
+        """
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.wait_budget = wait_budget
+        self.active = 0
+        self.queued = 0
+        # Moving average of how long one verification holds a slot
+        self.service_time = 1.0
+        # priority level -> gate_id -> waiters; gates rotate to the back when served
+        self.queues = {level: OrderedDict() for level in sorted(set(PRIORITIES.values()))}
+
+    def estimated_wait(self) -> float:
+        """Expected seconds a new arrival would wait for a slot"""
+        return (self.queued + 1) * self.service_time / self.capacity
+
+    async def acquire(self, gate_id: str = "default", priority: str = "normal", deadline: Optional[float] = None):
+        """
+        Wait for a verification slot
+
+        Args:
+            gate_id: Gate or lane the request comes from
+            priority: One of PRIORITIES; unknown values are treated as normal
+            deadline: Unix time after which the client no longer wants an answer
+
+        Raises:
+            AdmissionRejected: Queue is full, wait budget exceeded or deadline passed
+        """
+        if deadline is not None and deadline <= time.time():
+            raise AdmissionRejected("Client deadline already passed", 0)
+
+        if self.active < self.capacity and self.queued == 0:
+            self.active += 1
+            return
+
+        expected_wait = self.estimated_wait()
+        if self.queued >= self.max_queue or expected_wait > self.wait_budget:
+            raise AdmissionRejected("Verification queue is full, please retry shortly", expected_wait)
+
+        future = asyncio.get_running_loop().create_future()
+        level = PRIORITIES.get(priority, PRIORITIES["normal"])
+        self.queues[level].setdefault(gate_id, deque()).append((future, deadline))
+        self.queued += 1
+
+        timeout = self.wait_budget
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+
+        if not future.done():
+            self._abandon(future)
+            raise AdmissionRejected("Timed out waiting for a verification slot", self.estimated_wait())
+
+        # Raises AdmissionRejected if the waiter was dropped for its deadline
+        future.result()
+
+    def release(self, elapsed: float):
+        """
+        Free a slot, handing it straight to the next waiter if there is one
+
+        Args:
+            elapsed: Seconds the slot was held, used to estimate queue wait
+        """
+        self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+
+        future = self._next_waiter()
+        if future:
+            future.set_result(True)
+        else:
+            self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, gate_id: str = "default", priority: str = "normal", deadline: Optional[float] = None):
+        """Hold a verification slot for the duration of the block"""
+        await self.acquire(gate_id, priority, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # The slot was handed over just as the waiter gave up
+            self.release(0)
+        elif not future.done():
+            future.cancel()
+            self.queued -= 1
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        now = time.time()
+        for level in sorted(self.queues):
+            gates = self.queues[level]
+            while gates:
+                gate_id, waiters = next(iter(gates.items()))
+                gates.move_to_end(gate_id)
+                while waiters:
+                    future, deadline = waiters.popleft()
+                    if future.done():
+                        # Already abandoned and counted out of the queue
+                        continue
+                    self.queued -= 1
+                    if deadline is not None and deadline <= now:
+                        future.set_exception(AdmissionRejected("Client deadline passed while queued", 0))
+                        continue
+                    if not waiters:
+                        del gates[gate_id]
+                    return future
+                del gates[gate_id]
+        return None
+
+
+admission_controller = AdmissionController(VERIFY_MAX_INFLIGHT, VERIFY_MAX_QUEUE, VERIFY_QUEUE_BUDGET_SECONDS)
@@ -1,9 +1,13 @@
 from openai import OpenAI
 import os
+import asyncio
 import base64
+import time
 import httpx
 from dotenv import load_dotenv
+from typing import Awaitable, BinaryIO, Callable, Optional, Union
 from .ipfs_service import ipfs_service
+from .verify_ledger import verification_ledger
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,6 +19,11 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY", "")
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")  # Optional, but recommended for higher limits
 AI_MODEL = os.getenv("AI_MODEL", "")  # Override model if needed
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))  # Concurrent provider calls per worker
+VERIFY_MAX_IMAGE_BYTES = int(os.getenv("VERIFY_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))  # Selfie and ticket image size limit
+
+DATA_URI_PREFIX = "data:image/jpeg;base64,"
+ENCODE_CHUNK_BYTES = 3 * 64 * 1024  # Multiple of 3 so chunks encode without padding
 
 # Initialize client based on provider
 client = None
@@ -47,8 +56,121 @@ elif OPENAI_API_KEY:
 else:
     model = None
 
+# Shared by every verification on this worker so batch and single requests
+# together never exceed the provider concurrency limit
+provider_slots = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
+async def _call_provider(create, **kwargs):
+    # Provider SDK clients are synchronous; run them off the event loop
+    async with provider_slots:
+        return await asyncio.to_thread(create, **kwargs)
+
+class Base64Builder:
+    """
+    Incrementally base64-encode a byte stream into a single string, so an
+    image is never held as raw bytes, encoded bytes and a str at once
+    """
+    
+    def __init__(self, data_uri: bool = False):
+        self._parts = [DATA_URI_PREFIX] if data_uri else []
+        self._carry = b""
+        self.size = 0
+    
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        data = self._carry + chunk if self._carry else chunk
+        cut = len(data) - len(data) % 3
+        self._parts.append(base64.b64encode(data[:cut]).decode('ascii'))
+        self._carry = bytes(data[cut:])
+    
+    def finish(self) -> str:
+        if self._carry:
+            self._parts.append(base64.b64encode(self._carry).decode('ascii'))
+            self._carry = b""
+        encoded = "".join(self._parts)
+        self._parts = []
+        return encoded
+
+def encode_image(source: Union[bytes, BinaryIO], data_uri: bool = False) -> str:
+    """
+    Base64-encode image bytes or a binary file (such as a spooled upload)
+    
+    Args:
+        source: Raw bytes, or a file object positioned at the start of the image
+        data_uri: Prefix the result with a JPEG data: URI header
+        
+    Returns:
+        The encoded image as one string
+    """
+    encoder = Base64Builder(data_uri)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), ENCODE_CHUNK_BYTES):
+            encoder.feed(view[start:start + ENCODE_CHUNK_BYTES])
+    else:
+        while chunk := source.read(ENCODE_CHUNK_BYTES):
+            encoder.feed(chunk)
+    return encoder.finish()
+
+def _elapsed_ms(started: float) -> int:
+    return round((time.perf_counter() - started) * 1000)
+
+def _token_usage(response) -> Optional[dict]:
+    # OpenAI-compatible responses report prompt/completion tokens, Claude input/output
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    return {
+        "in": input_tokens if input_tokens is not None else getattr(usage, "prompt_tokens", None),
+        "out": output_tokens if output_tokens is not None else getattr(usage, "completion_tokens", None)
+    }
+
 class AIVerifyService:
-    async def verify_selfie(self, selfie_data: bytes, nft_metadata_uri: str) -> dict:
+    async def verify_selfie(
+        self,
+        selfie_data: Union[bytes, BinaryIO],
+        nft_metadata_uri: Optional[str],
+        on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+        ticket_image_uri: Optional[str] = None
+    ) -> dict:
+        """
+        Compare a selfie with the ticket image stored in the NFT metadata
+        
+        Args:
+            selfie_data: Selfie bytes or a binary file positioned at its start
+            nft_metadata_uri: IPFS URI of the ticket metadata
+            on_stage: Optional progress callback (see _verify_selfie)
+            ticket_image_uri: Ticket image URI already known (from a signed
+                credential); skips fetching the metadata
+            
+        Returns:
+            Verification result. "metrics" holds stage durations (ms), provider
+            payload sizes, provider, model and token usage for the call.
+        """
+        metrics = {"provider": AI_PROVIDER, "model": model, "ms": {}, "bytes": {}, "tokens": None}
+        started = time.perf_counter()
+        result = await self._verify_selfie(selfie_data, nft_metadata_uri, on_stage, metrics, ticket_image_uri)
+        metrics["ms"]["total"] = _elapsed_ms(started)
+        result["metrics"] = metrics
+        verification_ledger.record(metrics, result["status"])
+        return result
+    
+    async def _verify_selfie(
+        self,
+        selfie_data: Union[bytes, BinaryIO],
+        nft_metadata_uri: Optional[str],
+        on_stage: Optional[Callable[[str], Awaitable[None]]],
+        metrics: dict,
+        ticket_image_uri: Optional[str] = None
+    ) -> dict:
+        # on_stage is awaited with "fetched" once the ticket image is in hand
+        # and "provider_pending" right before the AI provider is called
+        async def stage(name: str):
+            if on_stage:
+                await on_stage(name)
+        
         if not client:
             provider_name_map = {
                 "gemini": "Gemini",
@@ -78,36 +200,39 @@ class AIVerifyService:
             }
         
         try:
-            metadata_url = ipfs_service.get_ipfs_url(nft_metadata_uri)
-            
-            if not metadata_url:
-                return {
-                    "verified": False,
-                    "status": "error",
-                    "reason": "Invalid metadata URI (mock IPFS hash detected). Please use real IPFS or configure Pinata credentials."
-                }
-            
-            print(f"Fetching metadata from: {metadata_url}")
-            async with httpx.AsyncClient(timeout=30.0) as http_client:
-                metadata_response = await http_client.get(metadata_url)
-            
-            if metadata_response.status_code != 200:
-                print(f"Metadata fetch failed: {metadata_response.status_code} - {metadata_response.text}")
-                return {
-                    "verified": False,
-                    "status": "error",
-                    "reason": f"Failed to fetch NFT metadata (HTTP {metadata_response.status_code})"
-                }
-            
-            metadata = metadata_response.json()
-            ticket_image_uri = metadata.get("image", "")
-            
             if not ticket_image_uri:
-                return {
-                    "verified": False,
-                    "status": "error",
-                    "reason": "No image found in NFT metadata"
-                }
+                metadata_url = ipfs_service.get_ipfs_url(nft_metadata_uri)
+                
+                if not metadata_url:
+                    return {
+                        "verified": False,
+                        "status": "error",
+                        "reason": "Invalid metadata URI (mock IPFS hash detected). Please use real IPFS or configure Pinata credentials."
+                    }
+                
+                print(f"Fetching metadata from: {metadata_url}")
+                fetch_started = time.perf_counter()
+                async with httpx.AsyncClient(timeout=30.0) as http_client:
+                    metadata_response = await http_client.get(metadata_url)
+                metrics["ms"]["metadata"] = _elapsed_ms(fetch_started)
+                
+                if metadata_response.status_code != 200:
+                    print(f"Metadata fetch failed: {metadata_response.status_code} - {metadata_response.text}")
+                    return {
+                        "verified": False,
+                        "status": "error",
+                        "reason": f"Failed to fetch NFT metadata (HTTP {metadata_response.status_code})"
+                    }
+                
+                metadata = metadata_response.json()
+                ticket_image_uri = metadata.get("image", "")
+                
+                if not ticket_image_uri:
+                    return {
+                        "verified": False,
+                        "status": "error",
+                        "reason": "No image found in NFT metadata"
+                    }
             
             ticket_image_url = ipfs_service.get_ipfs_url(ticket_image_uri)
             
@@ -120,24 +245,49 @@ class AIVerifyService:
             
             print(f"Fetching ticket image from: {ticket_image_url}")
             
-            selfie_base64 = base64.b64encode(selfie_data).decode('utf-8')
+            # Claude takes bare base64, the other providers take data: URIs.
+            # Each image is encoded once, directly in the form the provider needs
+            as_data_uri = AI_PROVIDER != "claude"
             
-            # Fetch ticket image for providers that need base64
+            # Stream the ticket image straight into its encoded form
+            fetch_started = time.perf_counter()
             async with httpx.AsyncClient(timeout=30.0) as http_client:
-                ticket_image_response = await http_client.get(ticket_image_url)
-                if ticket_image_response.status_code != 200:
-                    return {
-                        "verified": False,
-                        "status": "error",
-                        "reason": f"Failed to fetch ticket image (HTTP {ticket_image_response.status_code})"
-                    }
-                ticket_image_base64 = base64.b64encode(ticket_image_response.content).decode('utf-8')
+                async with http_client.stream("GET", ticket_image_url) as ticket_image_response:
+                    if ticket_image_response.status_code != 200:
+                        return {
+                            "verified": False,
+                            "status": "error",
+                            "reason": f"Failed to fetch ticket image (HTTP {ticket_image_response.status_code})"
+                        }
+                    ticket_image_encoder = Base64Builder(as_data_uri)
+                    async for chunk in ticket_image_response.aiter_bytes():
+                        ticket_image_encoder.feed(chunk)
+                        if ticket_image_encoder.size > VERIFY_MAX_IMAGE_BYTES:
+                            return {
+                                "verified": False,
+                                "status": "error",
+                                "reason": f"Ticket image exceeds {VERIFY_MAX_IMAGE_BYTES} bytes"
+                            }
+                    ticket_image = ticket_image_encoder.finish()
+            metrics["ms"]["image"] = _elapsed_ms(fetch_started)
+            
+            # Reading a spooled upload is file I/O, so keep it off the event loop
+            selfie_image = await asyncio.to_thread(encode_image, selfie_data, as_data_uri)
+            del selfie_data
+            metrics["bytes"] = {"selfie": len(selfie_image), "ticket_image": len(ticket_image)}
+            
+            await stage("fetched")
+            await stage("provider_pending")
+            
+            provider_started = time.perf_counter()
+            response = None
             
             # Prepare image content based on provider
             if AI_PROVIDER == "claude":
                 # Claude API format
                 try:
-                    response = client.messages.create(
+                    response = await _call_provider(
+                        client.messages.create,
                         model=model,
                         max_tokens=300,
                         messages=[
@@ -164,7 +314,7 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                                         "source": {
                                             "type": "base64",
                                             "media_type": "image/jpeg",
-                                            "data": selfie_base64
+                                            "data": selfie_image
                                         }
                                     },
                                     {
@@ -172,7 +322,7 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                                         "source": {
                                             "type": "base64",
                                             "media_type": "image/jpeg",
-                                            "data": ticket_image_base64
+                                            "data": ticket_image
                                         }
                                     }
                                 ]
@@ -200,14 +350,14 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                     
                     # Use visual question answering to compare faces
                     # We'll ask the model to compare the two images
-                    async with httpx.AsyncClient(timeout=90.0) as http_client:
+                    async with provider_slots, httpx.AsyncClient(timeout=90.0) as http_client:
                         # First, get detailed descriptions of both images
                         prompt = "Describe the person in this image in detail, focusing on facial features, hair, and distinctive characteristics."
                         
                         # Analyze selfie
                         selfie_payload = {
                             "inputs": {
-                                "image": f"data:image/jpeg;base64,{selfie_base64}",
+                                "image": selfie_image,
                                 "question": prompt
                             }
                         }
@@ -215,7 +365,7 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                         # Analyze ticket image
                         ticket_payload = {
                             "inputs": {
-                                "image": f"data:image/jpeg;base64,{ticket_image_base64}",
+                                "image": ticket_image,
                                 "question": prompt
                             }
                         }
@@ -270,8 +420,8 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                                 hf_model_fallback = "Salesforce/blip-image-captioning-base"
                                 hf_url_fallback = f"https://api-inference.huggingface.co/models/{hf_model_fallback}"
                                 
-                                selfie_payload_simple = {"inputs": f"data:image/jpeg;base64,{selfie_base64}"}
-                                ticket_payload_simple = {"inputs": f"data:image/jpeg;base64,{ticket_image_base64}"}
+                                selfie_payload_simple = {"inputs": selfie_image}
+                                ticket_payload_simple = {"inputs": ticket_image}
                                 
                                 selfie_response = await http_client.post(hf_url_fallback, headers=headers, json=selfie_payload_simple)
                                 ticket_response = await http_client.post(hf_url_fallback, headers=headers, json=ticket_payload_simple)
@@ -370,18 +520,19 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{selfie_base64}"
+                            "url": selfie_image
                         }
                     },
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{ticket_image_base64}"
+                            "url": ticket_image
                         }
                     }
                 ]
                 
-                response = client.chat.completions.create(
+                response = await _call_provider(
+                    client.chat.completions.create,
                     model=model,
                     messages=[
                         {
@@ -414,20 +565,21 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{selfie_base64}",
+                            "url": selfie_image,
                             "detail": "high"
                         }
                     },
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{ticket_image_base64}",
+                            "url": ticket_image,
                             "detail": "high"
                         }
                     }
                 ]
                 
-                response = client.chat.completions.create(
+                response = await _call_provider(
+                    client.chat.completions.create,
                     model=model,
                     messages=[
                         {
@@ -440,6 +592,9 @@ Your response must start with one of these three words: VERIFIED, SUSPICIOUS, or
                 
                 result_text = (response.choices[0].message.content or "").strip()
             
+            metrics["ms"]["provider"] = _elapsed_ms(provider_started)
+            metrics["tokens"] = _token_usage(response)
+            
             # Parse result - look for keywords in the response
             result_text_upper = result_text.upper()
             print(f"AI Response (raw): {result_text}")
@@ -6,6 +6,7 @@ This service uses QIE SDK for all blockchain operations:
 - Minting NFT tickets (QIE SDK)
 """
 
+import asyncio
 import json
 import os
 from dotenv import load_dotenv
@@ -39,6 +40,26 @@ NFT_ABI = [
         "stateMutability": "nonpayable",
         "type": "function"
     },
+    {
+        "inputs": [
+            {"internalType": "address[]", "name": "to", "type": "address[]"},
+            {"internalType": "string[]", "name": "uris", "type": "string[]"}
+        ],
+        "name": "mintBatch",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "address", "name": "to", "type": "address"},
+            {"indexed": True, "internalType": "uint256", "name": "tokenId", "type": "uint256"},
+            {"indexed": False, "internalType": "string", "name": "tokenURI", "type": "string"}
+        ],
+        "name": "TicketMinted",
+        "type": "event"
+    },
     {
         "inputs": [{"internalType": "uint256", "name": "tokenId", "type": "uint256"}],
         "name": "tokenURI",
@@ -60,6 +81,16 @@ NFT_ABI = [
         "stateMutability": "view",
         "type": "function"
     },
+    {
+        "inputs": [
+            {"internalType": "address", "name": "owner", "type": "address"},
+            {"internalType": "uint256", "name": "index", "type": "uint256"}
+        ],
+        "name": "tokenOfOwnerByIndex",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
     {
         "inputs": [],
         "name": "totalSupply",
@@ -128,8 +159,10 @@ class BlockchainService:
         if not self.qie_contract or not ORGANIZER_PRIVATE_KEY:
             raise Exception("QIE contract not initialized or private key not set. Please deploy contract using QIEDEX Token Creator.")
         
-        # Use QIE SDK to mint ticket
-        result = self.qie_contract.mint(
+        # Use QIE SDK to mint ticket; signing and waiting for the receipt
+        # block, so they run in a thread to keep the event loop free
+        result = await asyncio.to_thread(
+            self.qie_contract.mint,
             wallet_address,
             metadata_uri,
             ORGANIZER_PRIVATE_KEY
@@ -137,6 +170,27 @@ class BlockchainService:
         
         return result
     
+    async def mint_batch(self, wallet_addresses: list, metadata_uris: list) -> dict:
+        """
+        Mint several NFT tickets in one transaction using QIE Blockchain SDK
+        
+        Args:
+            wallet_addresses: Recipient wallet addresses
+            metadata_uris: IPFS URI for each ticket's metadata, paired by position
+            
+        Returns:
+            Transaction result with tx_hash and token_ids
+        """
+        if not self.qie_contract or not ORGANIZER_PRIVATE_KEY:
+            raise Exception("QIE contract not initialized or private key not set. Please deploy contract using QIEDEX Token Creator.")
+        
+        return await asyncio.to_thread(
+            self.qie_contract.mint_batch,
+            wallet_addresses,
+            metadata_uris,
+            ORGANIZER_PRIVATE_KEY
+        )
+    
     async def get_tickets_of_owner(self, wallet_address: str) -> list:
         """
         Get all tickets owned by a wallet using QIE Blockchain SDK
@@ -150,8 +204,8 @@ class BlockchainService:
         if not self.qie_nft:
             return []
         
-        # Use QIE SDK to get tickets
-        return self.qie_nft.get_tickets_of_owner(wallet_address)
+        # Use QIE SDK to get tickets; the contract reads block, so run them in a thread
+        return await asyncio.to_thread(self.qie_nft.get_tickets_of_owner, wallet_address)
     
     def get_token_uri(self, token_id: int) -> str:
         """
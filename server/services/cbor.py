@@ -0,0 +1,88 @@
+"""
+Minimal CBOR (RFC 8949)
+Encodes and decodes the subset compact payloads use: unsigned integers,
+byte strings, text strings and arrays. Encoding is deterministic (shortest
+lengths), so signatures over encoded bytes can be checked after re-encoding.
+"""
+
+from typing import Union
+
+# Major types
+UNSIGNED, BYTES, TEXT, ARRAY = 0, 2, 3, 4
+
+# Deepest array nesting decoded; payloads use at most two levels (manifest
+# columns inside the payload array), and a cap keeps crafted input of
+# nested arrays from exhausting the recursion limit
+MAX_DEPTH = 3
+
+
+def _head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([major << 5 | value])
+    for extra, size in ((24, 1), (25, 2), (26, 4), (27, 8)):
+        if value < 256 ** size:
+            return bytes([major << 5 | extra]) + value.to_bytes(size, "big")
+    raise ValueError("Integer too large for CBOR")
+
+
+def encode(item: Union[int, bytes, str, list]) -> bytes:
+    """CBOR encoding of an unsigned int, byte string, text string or array of them"""
+    if isinstance(item, bool) or not isinstance(item, (int, bytes, str, list)):
+        raise TypeError(f"Cannot encode {type(item).__name__} as CBOR")
+    if isinstance(item, int):
+        if item < 0:
+            raise ValueError("Negative integers are not supported")
+        return _head(UNSIGNED, item)
+    if isinstance(item, bytes):
+        return _head(BYTES, len(item)) + item
+    if isinstance(item, str):
+        encoded = item.encode("utf-8")
+        return _head(TEXT, len(encoded)) + encoded
+    return _head(ARRAY, len(item)) + b"".join(encode(element) for element in item)
+
+
+def _read(data: bytes, offset: int, depth: int = 0) -> tuple:
+    if offset >= len(data):
+        raise ValueError("Truncated CBOR")
+    major, extra = data[offset] >> 5, data[offset] & 0x1F
+    offset += 1
+    if extra < 24:
+        value = extra
+    elif extra <= 27:
+        size = 1 << (extra - 24)
+        if offset + size > len(data):
+            raise ValueError("Truncated CBOR")
+        value = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    else:
+        raise ValueError("Unsupported CBOR length")
+
+    if major == UNSIGNED:
+        return value, offset
+    if major in (BYTES, TEXT):
+        if offset + value > len(data):
+            raise ValueError("Truncated CBOR")
+        raw = data[offset:offset + value]
+        return (raw if major == BYTES else raw.decode("utf-8")), offset + value
+    if major == ARRAY:
+        if depth >= MAX_DEPTH:
+            raise ValueError("CBOR nested too deeply")
+        items = []
+        for _ in range(value):
+            item, offset = _read(data, offset, depth + 1)
+            items.append(item)
+        return items, offset
+    raise ValueError(f"Unsupported CBOR major type {major}")
+
+
+def decode(data: bytes):
+    """
+    Item encoded by encode()
+
+    Raises:
+        ValueError: data is not a single item of the supported subset
+    """
+    item, offset = _read(data, 0)
+    if offset != len(data):
+        raise ValueError("Trailing bytes after CBOR item")
+    return item
@@ -0,0 +1,143 @@
+"""
+Local IPFS CID Computation
+Computes the CIDv1 that IPFS assigns to a file when it is added with CID
+version 1 (raw leaves, 256 KiB chunks, balanced layout), so a URI can be
+handed out before the file is actually pinned:
+- A file that fits in one chunk is a single raw block
+- A larger file is a tree of UnixFS dag-pb nodes over raw leaf blocks,
+  at most 174 links per node
+"""
+
+import base64
+import hashlib
+from typing import List, Tuple
+
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+RAW_CODEC = 0x55
+DAG_PB_CODEC = 0x70
+SHA2_256 = 0x12
+UNIXFS_FILE = 2
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    # Length-delimited protobuf field
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+
+def _cid_bytes(codec: int, block: bytes) -> bytes:
+    digest = hashlib.sha256(block).digest()
+    return _varint(1) + _varint(codec) + _varint(SHA2_256) + _varint(len(digest)) + digest
+
+
+def _file_node(children: List[Tuple[bytes, int, int]]) -> bytes:
+    """
+    dag-pb node of a UnixFS file over already built children
+
+    Args:
+        children: (CID bytes, content size, total encoded size) per child
+    """
+    unixfs = _varint_field(1, UNIXFS_FILE) + _varint_field(3, sum(size for _, size, _ in children))
+    for _, size, _ in children:
+        unixfs += _varint_field(4, size)
+
+    # dag-pb writes Links (field 2) before Data (field 1)
+    node = b""
+    for cid, _, tsize in children:
+        node += _field(2, _field(1, cid) + _field(2, b"") + _varint_field(3, tsize))
+    return node + _field(1, unixfs)
+
+
+def _build(leaves: List[Tuple[bytes, int, int]], depth: int) -> Tuple[bytes, int, int]:
+    if depth == 1:
+        children = leaves
+    else:
+        span = MAX_LINKS ** (depth - 1)
+        children = [_build(leaves[start:start + span], depth - 1) for start in range(0, len(leaves), span)]
+
+    node = _file_node(children)
+    return (
+        _cid_bytes(DAG_PB_CODEC, node),
+        sum(size for _, size, _ in children),
+        len(node) + sum(tsize for _, _, tsize in children)
+    )
+
+
+def encode_cid(cid: bytes) -> str:
+    """Base32 (multibase "b") string form of binary CID bytes"""
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+class CIDBuilder:
+    """
+    Computes a CID from content fed in pieces, holding at most one chunk
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.leaves: List[Tuple[bytes, int, int]] = []
+
+    def _add_leaf(self, chunk: bytes):
+        self.leaves.append((_cid_bytes(RAW_CODEC, chunk), len(chunk), len(chunk)))
+
+    def feed(self, data: bytes):
+        """Add the next piece of content, of any size"""
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self.buffer += view[start:start + CHUNK_SIZE]
+            # Keep a full chunk back: content that ends up exactly one chunk
+            # long is a single raw block, not a tree
+            if len(self.buffer) > CHUNK_SIZE:
+                self._add_leaf(bytes(self.buffer[:CHUNK_SIZE]))
+                del self.buffer[:CHUNK_SIZE]
+
+    def finish(self) -> str:
+        """
+        CID of everything fed so far
+
+        Returns:
+            CID string, e.g. "bafkrei..." for small files or "bafybei..." for chunked ones
+        """
+        if not self.leaves:
+            return encode_cid(_cid_bytes(RAW_CODEC, bytes(self.buffer)))
+
+        if self.buffer:
+            self._add_leaf(bytes(self.buffer))
+            self.buffer.clear()
+
+        depth = 1
+        while MAX_LINKS ** depth < len(self.leaves):
+            depth += 1
+        return encode_cid(_build(self.leaves, depth)[0])
+
+
+def cid_for_bytes(data: bytes) -> str:
+    """
+    CIDv1 of a file's content
+
+    Args:
+        data: File content
+
+    Returns:
+        CID string, e.g. "bafkrei..." for small files or "bafybei..." for chunked ones
+    """
+    builder = CIDBuilder()
+    builder.feed(data)
+    return builder.finish()
@@ -0,0 +1,169 @@
+"""
+Event Catalog Cache
+In-process, size-bounded cache of event documents and event list pages.
+Entries are invalidated from a MongoDB change stream on the events
+collection so every worker stays coherent. Standalone servers have no
+change streams, so the cache falls back to polling for events whose
+updated_at moved. Seat counts used to decide a sale are never read from
+here (see InventoryService).
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Awaitable, Optional
+from dotenv import load_dotenv
+from database import events_collection
+from repositories import events as events_repo
+
+# Load environment variables from .env file
+load_dotenv()
+
+EVENT_CACHE_SIZE = int(os.getenv("EVENT_CACHE_SIZE", "1024"))
+EVENT_CACHE_PAGES = int(os.getenv("EVENT_CACHE_PAGES", "64"))
+EVENT_CACHE_POLL_SECONDS = float(os.getenv("EVENT_CACHE_POLL_SECONDS", "2"))
+
+# Polls re-check this far behind the last poll so writes stamped by a
+# worker with a slightly slow clock are not missed
+POLL_OVERLAP = timedelta(seconds=5)
+
+# Updates that only move a seat hold do not change what readers see
+RESERVATION_FIELDS = {"reserved_count", "reservations"}
+
+
+class _LRU(OrderedDict):
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def get(self, key):
+        if key not in self:
+            return None
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class EventCache:
+    """
+    Event documents by ID plus serialized list pages
+    """
+
+    def __init__(self, max_events: int, max_pages: int):
+        """
+        Initialize the cache
+
+        Args:
+            max_events: Event documents kept
+            max_pages: Event list pages kept
+        """
+        self.events = _LRU(max_events)
+        self.pages = _LRU(max_pages)
+        self.mode = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def get_event(self, event_id: str) -> Optional[dict]:
+        """
+        Event document by ID, from memory when possible
+
+        Returns:
+            A copy the caller may modify, or None if the event does not exist
+
+        Raises:
+            bson.errors.InvalidId: event_id is not a valid ObjectId
+        """
+        event = self.events.get(event_id)
+        if event is None:
+            event = await events_repo.find_event(event_id)
+            if event is None:
+                return None
+            event.pop("reservations", None)
+            self.events.put(event_id, event)
+        return dict(event)
+
+    async def get_page(self, key: tuple, load: Callable[[], Awaitable]):
+        """
+        Cached event list page
+
+        Args:
+            key: Everything that determines the page (cursor, limit, fields)
+            load: Coroutine function producing the page when it is not cached
+        """
+        page = self.pages.get(key)
+        if page is None:
+            page = await load()
+            self.pages.put(key, page)
+        return page
+
+    def invalidate(self, event_id: Optional[str] = None):
+        """Drop one event (or all when None) and every list page"""
+        if event_id is None:
+            self.events.clear()
+        else:
+            self.events.pop(event_id, None)
+        self.pages.clear()
+
+    async def _watch_change_stream(self):
+        async with events_collection.watch() as stream:
+            self.mode = "change_stream"
+            print("✓ Event cache invalidated by change stream")
+            async for change in stream:
+                updated = set(change.get("updateDescription", {}).get("updatedFields", {}))
+                if change["operationType"] == "update" and updated and all(
+                    field.split(".")[0] in RESERVATION_FIELDS for field in updated
+                ):
+                    continue
+                document_key = change.get("documentKey")
+                self.invalidate(str(document_key["_id"]) if document_key else None)
+
+    async def _poll_updates(self):
+        self.mode = "polling"
+        print(f"Event cache polling for updates every {EVENT_CACHE_POLL_SECONDS}s (change streams unavailable)")
+        watermark = datetime.utcnow()
+        while True:
+            await asyncio.sleep(EVENT_CACHE_POLL_SECONDS)
+            polled_at = datetime.utcnow()
+            try:
+                changed = await events_repo.find_updated_event_ids(watermark - POLL_OVERLAP)
+            except Exception as e:
+                print(f"Event cache poll error: {e}")
+                continue
+            watermark = polled_at
+            for event_id in changed:
+                self.invalidate(event_id)
+
+    async def _run(self):
+        try:
+            await self._watch_change_stream()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Standalone servers reject change streams
+            print(f"Event cache change stream unavailable: {e}")
+        # Anything cached while the stream was down may be stale
+        self.invalidate()
+        await self._poll_updates()
+
+    def start(self):
+        """Start keeping the cache coherent in the background"""
+        if not self._watcher:
+            self._watcher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background invalidation task"""
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+event_cache = EventCache(EVENT_CACHE_SIZE, EVENT_CACHE_PAGES)
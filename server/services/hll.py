@@ -0,0 +1,59 @@
+"""
+HyperLogLog Sketch
+Estimates distinct counts in a fixed number of registers (about 3% standard
+error at the precision used here). Registers only ever grow, so a sketch can
+be kept in a MongoDB document as "<field>.<index>" keys updated with $max,
+and two sketches merge by taking the larger value of each register.
+"""
+
+import hashlib
+import math
+from typing import Dict, Tuple
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+REMAINING_BITS = HASH_BITS - PRECISION
+
+
+def register(value: str) -> Tuple[int, int]:
+    """
+    Register update for one value
+
+    Args:
+        value: Item to count, e.g. a wallet address
+
+    Returns:
+        (register index, rank); the register should become max(current, rank)
+    """
+    hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=HASH_BITS // 8).digest(), "big")
+    index = hashed >> REMAINING_BITS
+    rest = hashed & ((1 << REMAINING_BITS) - 1)
+    # Position of the leftmost 1 bit in the remaining bits
+    rank = REMAINING_BITS - rest.bit_length() + 1
+    return index, rank
+
+
+def estimate(registers: Dict) -> int:
+    """
+    Estimated number of distinct values added to a sketch
+
+    Args:
+        registers: Register index (int or str, as stored in MongoDB) -> rank;
+            missing registers count as zero
+
+    Returns:
+        Estimated distinct count
+    """
+    ranks = [0] * REGISTERS
+    for index, rank in registers.items():
+        ranks[int(index)] = rank
+
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    raw = alpha * REGISTERS * REGISTERS / sum(2.0 ** -rank for rank in ranks)
+
+    zeros = ranks.count(0)
+    if raw <= 2.5 * REGISTERS and zeros:
+        # Small range correction (linear counting)
+        return round(REGISTERS * math.log(REGISTERS / zeros))
+    return round(raw)
@@ -0,0 +1,143 @@
+"""
+Event Image Derivatives
+Resized copies of event images, so pages never load the full original:
+- Rendered once, when the event is created, in a thread pool (Pillow releases
+  the GIL while decoding, resizing and encoding), at each width in
+  IMAGE_DERIVATIVE_WIDTHS (never upscaled), as both WebP and JPEG
+- Stored content-addressed by sha256 in MongoDB, so every server can serve
+  them and identical renders are stored once
+- The event lists its variants; the sha256 of each doubles as its ETag
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+from repositories import images as images_repo
+
+# Load environment variables from .env file
+load_dotenv()
+
+IMAGE_DERIVATIVE_WIDTHS = sorted({int(width) for width in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "320,640,1280").split(",")})
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_DERIVATIVE_THREADS = int(os.getenv("IMAGE_DERIVATIVE_THREADS", "2"))
+
+# Format name -> (content type, Pillow save options)
+FORMATS = {
+    "webp": ("image/webp", {"format": "WEBP", "quality": IMAGE_DERIVATIVE_QUALITY, "method": 4}),
+    "jpeg": ("image/jpeg", {"format": "JPEG", "quality": IMAGE_DERIVATIVE_QUALITY, "optimize": True, "progressive": True}),
+}
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    # JPEG has no alpha; transparent areas become white rather than black
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, "white")
+        flattened.paste(image, mask=image.getchannel("A"))
+        return flattened
+    return image.convert("RGB")
+
+
+def render(source: BinaryIO, widths: List[int] = IMAGE_DERIVATIVE_WIDTHS) -> List[dict]:
+    """
+    Resize and encode an image at each width in every format (blocking)
+
+    Args:
+        source: Binary file holding the original image
+        widths: Target widths; widths at or above the original's collapse into one at its own width
+
+    Returns:
+        {"width", "format", "content_type", "data"} per derivative
+
+    Raises:
+        PIL.UnidentifiedImageError: source is not an image Pillow can read
+    """
+    with Image.open(source) as original:
+        # JPEGs can be decoded at 1/2 to 1/8 scale for far less work than a
+        # full decode; a square request keeps enough pixels whichever way
+        # the EXIF orientation turns the image
+        original.draft("RGB", (max(widths), max(widths)))
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    targets = sorted({min(width, image.width) for width in widths}, reverse=True)
+    derivatives = []
+    for width in targets:
+        # Each size is scaled down from the previous, larger one
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for name, (content_type, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            derivatives.append({"width": width, "format": name, "content_type": content_type, "data": buffer.getvalue()})
+    return derivatives
+
+
+def pick_variant(variants: Optional[List[dict]], width: int, image_format: str) -> Optional[dict]:
+    """
+    Variant to serve for a requested width
+
+    Args:
+        variants: The event's image_variants
+        width: Width the page will display the image at
+        image_format: "webp" or "jpeg"
+
+    Returns:
+        The narrowest variant at least that wide (the widest if none is), or None
+    """
+    candidates = sorted(
+        (variant for variant in variants or [] if variant["format"] == image_format),
+        key=lambda variant: variant["width"]
+    )
+    if not candidates:
+        return None
+    return next((variant for variant in candidates if variant["width"] >= width), candidates[-1])
+
+
+class ImageDerivativeService:
+    """
+    Thread pool that renders and stores image derivatives
+    """
+
+    def __init__(self, threads: int):
+        """
+        Initialize the service
+
+        Args:
+            threads: Images rendered at once per server process
+        """
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="image-derivatives")
+
+    async def generate(self, source: BinaryIO) -> List[dict]:
+        """
+        Render and store the derivatives of an image
+
+        Args:
+            source: Binary file holding the original image, positioned at its start
+
+        Returns:
+            {"width", "format", "sha256", "size"} per stored derivative, for the event's image_variants
+
+        Raises:
+            PIL.UnidentifiedImageError: source is not an image Pillow can read
+        """
+        derivatives = await asyncio.get_running_loop().run_in_executor(self.executor, render, source)
+        for derivative in derivatives:
+            derivative["sha256"] = hashlib.sha256(derivative["data"]).hexdigest()
+        await images_repo.store_images(derivatives)
+        return [
+            {
+                "width": derivative["width"],
+                "format": derivative["format"],
+                "sha256": derivative["sha256"],
+                "size": len(derivative["data"])
+            }
+            for derivative in derivatives
+        ]
+
+
+image_derivative_service = ImageDerivativeService(IMAGE_DERIVATIVE_THREADS)
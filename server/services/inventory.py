@@ -0,0 +1,174 @@
+"""
+Ticket Inventory Service
+Sells seats without overselling and without serializing purchases:
+- A conditional update holds a seat only while sold + reserved < total supply
+- Held seats are committed when minting succeeds or released when it fails
+- Reservations are kept alive while their tickets are minted; a background
+  sweeper releases those whose minting never finished
+- Sold-out events are remembered briefly so repeat buyers are rejected without a DB round trip
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from repositories import events as events_repo
+from services.event_cache import event_cache
+
+# Load environment variables from .env file
+load_dotenv()
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "300"))
+RESERVATION_SWEEP_SECONDS = int(os.getenv("RESERVATION_SWEEP_SECONDS", "30"))
+SOLD_OUT_CACHE_SECONDS = float(os.getenv("SOLD_OUT_CACHE_SECONDS", "5"))
+
+
+class InventoryService:
+    """
+    Seat reservations on top of the event document's sold and reserved counters
+    """
+
+    def __init__(self):
+        # event_id -> monotonic time until which the event is treated as sold out
+        self.sold_out: Dict[str, float] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def is_sold_out(self, event_id: str) -> bool:
+        """Cheap in-memory check; may lag other workers by SOLD_OUT_CACHE_SECONDS"""
+        until = self.sold_out.get(event_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del self.sold_out[event_id]
+            return False
+        return True
+
+    async def reserve(self, event_id: str, quantity: int = 1) -> Optional[str]:
+        """
+        Hold seats for a purchase in progress
+
+        Args:
+            event_id: Event to buy seats for
+            quantity: Number of seats
+
+        Returns:
+            Reservation ID, or None if the event cannot supply the seats
+        """
+        if self.is_sold_out(event_id):
+            return None
+
+        reservation = {
+            "id": uuid.uuid4().hex,
+            "quantity": quantity,
+            "expires_at": datetime.utcnow() + timedelta(seconds=RESERVATION_TTL_SECONDS)
+        }
+        if not await events_repo.reserve_seats(event_id, reservation):
+            if quantity == 1:
+                self.sold_out[event_id] = time.monotonic() + SOLD_OUT_CACHE_SECONDS
+            return None
+        return reservation["id"]
+
+    async def extend(self, event_id: str, reservation_id: str) -> bool:
+        """
+        Push a reservation's expiry RESERVATION_TTL_SECONDS into the future
+
+        Returns:
+            False if the reservation is gone (released or expired and swept)
+        """
+        expires_at = datetime.utcnow() + timedelta(seconds=RESERVATION_TTL_SECONDS)
+        return await events_repo.extend_reservation(event_id, reservation_id, expires_at)
+
+    @asynccontextmanager
+    async def held(self, event_id: str, *reservation_ids: str):
+        """
+        Keep reservations from expiring while the block runs, however long
+        minting takes; a crashed worker stops extending them, so they still
+        expire after it
+        """
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(RESERVATION_TTL_SECONDS / 3)
+                for reservation_id in reservation_ids:
+                    try:
+                        if not await self.extend(event_id, reservation_id):
+                            print(f"Warning: reservation {reservation_id} was lost while held")
+                    except Exception as e:
+                        print(f"Could not extend reservation {reservation_id}: {e}")
+
+        task = asyncio.create_task(keep_alive())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def commit(self, event_id: str, reservation_id: str, quantity: int = 1) -> bool:
+        """
+        Count reserved seats as sold once their tickets are minted
+
+        Returns:
+            False if the reservation was gone and no free seats were left to
+            count instead, i.e. the tickets oversell the event
+        """
+        committed = await events_repo.commit_reservation(event_id, reservation_id, quantity)
+        if not committed:
+            # The seats were released, but the tickets exist on chain; count
+            # them as sold if that still fits the supply
+            committed = await events_repo.sell_unreserved_seats(event_id, quantity)
+            if committed:
+                print(f"Warning: reservation {reservation_id} expired before commit; sold {quantity} free seat(s) instead")
+            else:
+                print(f"Error: reservation {reservation_id} expired and its seats were resold; {quantity} ticket(s) oversell event {event_id}")
+        event_cache.invalidate(event_id)
+        return committed
+
+    async def release(self, event_id: str, reservation_id: str, quantity: int = 1):
+        """Give reserved seats back after a failed purchase"""
+        if await events_repo.release_reservation(event_id, reservation_id, quantity):
+            self.sold_out.pop(event_id, None)
+
+    async def sweep(self) -> int:
+        """
+        Release every expired reservation
+
+        Returns:
+            Number of reservations released
+        """
+        released = 0
+        now = datetime.utcnow()
+        for event_id, reservation in await events_repo.find_expired_reservations(now):
+            if await events_repo.release_reservation(event_id, reservation["id"], reservation["quantity"], expired_before=now):
+                self.sold_out.pop(event_id, None)
+                released += 1
+        return released
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(RESERVATION_SWEEP_SECONDS)
+            try:
+                released = await self.sweep()
+                if released:
+                    print(f"Released {released} expired ticket reservation(s)")
+            except Exception as e:
+                print(f"Reservation sweep error: {e}")
+
+    def start(self):
+        """Start the background reservation sweeper"""
+        if not self._sweeper:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        """Stop the background reservation sweeper"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+
+inventory_service = InventoryService()
@@ -1,8 +1,13 @@
+import asyncio
+import hashlib
 import httpx
 import json
 import os
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Optional
 from dotenv import load_dotenv
+from services.pin_queue import PinQueue, StagedContent, Source, UploadTooLarge, PIN_SPOOL_DIR, PIN_WORKERS
+from repositories import content as content_repo
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,7 +17,11 @@ PINATA_SECRET_API_KEY = os.getenv("PINATA_SECRET_API_KEY", "")
 PINATA_JWT = os.getenv("PINATA_JWT", "")
 
 PINATA_PIN_FILE_URL = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-PINATA_PIN_JSON_URL = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+
+IPFS_MAX_UPLOAD_BYTES = int(os.getenv("IPFS_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+# Recently stored content hashes kept in memory, on top of the content_hashes collection
+IPFS_DEDUPE_CACHE_SIZE = int(os.getenv("IPFS_DEDUPE_CACHE_SIZE", "4096"))
 
 class IPFSService:
     def __init__(self):
@@ -22,61 +31,134 @@ class IPFSService:
         elif PINATA_API_KEY and PINATA_SECRET_API_KEY:
             self.headers["pinata_api_key"] = PINATA_API_KEY
             self.headers["pinata_secret_api_key"] = PINATA_SECRET_API_KEY
+        self.pin_queue = PinQueue(self._pin_file, PIN_SPOOL_DIR, PIN_WORKERS)
+        # sha256 -> CID of content already pinned, most recently used last
+        self.known: OrderedDict = OrderedDict()
+        # sha256 -> CID future of content being stored right now
+        self.in_flight: Dict[str, asyncio.Future] = {}
     
-    async def upload_file(self, file_data: bytes, filename: str) -> Optional[str]:
-        if not self.headers:
-            print("Warning: IPFS credentials not configured. Using mock IPFS hash.")
-            return f"ipfs://QmMockHash{hash(file_data) % 10000}/{filename}"
+    async def upload_file(self, source: Source, filename: str, max_bytes: Optional[int] = IPFS_MAX_UPLOAD_BYTES) -> Optional[str]:
+        """
+        Store a file on IPFS
+        
+        The content is streamed to a local spool in chunks, hashed on the way,
+        and queued for pinning, so this returns without waiting for Pinata and
+        never holds a whole file in memory; the content becomes retrievable
+        through gateways once the pin queue has uploaded it. Content already
+        pinned (by sha256) is not stored again, and concurrent uploads of the
+        same content share one store.
         
+        Args:
+            source: Bytes, a binary file (such as UploadFile.file) or an async byte iterator
+            filename: Name to pin the file under
+            max_bytes: Largest size accepted, None for no limit
+            
+        Returns:
+            ipfs:// URI of the file
+        
+        Raises:
+            UploadTooLarge: The content exceeds max_bytes
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            if max_bytes is not None and len(source) > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            # Already in memory, so known content can be answered without touching disk
+            cid = self._recall(hashlib.sha256(source).hexdigest())
+            if cid and self.headers:
+                return f"ipfs://{cid}"
+        
+        staged = await self.pin_queue.stage(source, max_bytes)
         try:
-            files = {
-                'file': (filename, file_data, 'application/octet-stream')
-            }
+            if not self.headers:
+                print("Warning: IPFS credentials not configured. Using mock IPFS hash.")
+                return f"ipfs://QmMockHash{int(staged.sha256[:8], 16) % 10000}/{filename}"
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    PINATA_PIN_FILE_URL,
-                    files=files,
-                    headers=self.headers
-                )
-                
-                if response.status_code == 200:
-                    ipfs_hash = response.json()['IpfsHash']
-                    return f"ipfs://{ipfs_hash}"
-                else:
-                    print(f"IPFS upload error: {response.text}")
-                    raise Exception(f"IPFS upload failed with status {response.status_code}")
-        except Exception as e:
-            print(f"IPFS upload exception: {e}")
-            raise Exception(f"Failed to upload to IPFS: {str(e)}")
+            return f"ipfs://{await self._store(staged, filename)}"
+        finally:
+            await asyncio.to_thread(staged.discard)
+    
+    def _recall(self, sha256: str) -> Optional[str]:
+        cid = self.known.get(sha256)
+        if cid:
+            self.known.move_to_end(sha256)
+        return cid
+    
+    async def _store(self, staged: StagedContent, filename: str) -> str:
+        cid = self._recall(staged.sha256)
+        if cid:
+            return cid
+        
+        if staged.sha256 in self.in_flight:
+            return await asyncio.shield(self.in_flight[staged.sha256])
+        
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[staged.sha256] = future
+        try:
+            cid = await content_repo.find_cid(staged.sha256)
+            if cid:
+                self._remember(staged.sha256, cid)
+            else:
+                # Not remembered until the pin queue records it as pinned, so
+                # if this pin fails the next upload queues the content again
+                cid = staged.cid
+                await self.pin_queue.enqueue(staged, filename)
+            future.set_result(cid)
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters get the error; mark it retrieved so an upload nobody
+            # joined does not log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[staged.sha256]
+        return cid
+    
+    def _remember(self, sha256: str, cid: str):
+        self.known[sha256] = cid
+        while len(self.known) > IPFS_DEDUPE_CACHE_SIZE:
+            self.known.popitem(last=False)
     
     async def upload_json(self, metadata: dict) -> Optional[str]:
+        """
+        Store JSON metadata on IPFS
+        
+        Uploaded as a file of its serialized bytes rather than through Pinata's
+        JSON endpoint, whose serialization (and so CID) cannot be predicted.
+        
+        Args:
+            metadata: JSON-serializable metadata
+            
+        Returns:
+            ipfs:// URI of the metadata
+        """
         if not self.headers:
             print("Warning: IPFS credentials not configured. Using mock IPFS hash.")
             return f"ipfs://QmMockMetadata{hash(json.dumps(metadata)) % 10000}"
         
-        try:
+        return await self.upload_file(json.dumps(metadata).encode("utf-8"), "metadata.json")
+    
+    async def _pin_file(self, path: str, filename: str) -> str:
+        """Stream a spooled file to Pinata as a CIDv1 file and return the CID it was pinned under"""
+        data = {
+            "pinataOptions": json.dumps({"cidVersion": 1}),
+            "pinataMetadata": json.dumps({"name": filename})
+        }
+        
+        with open(path, "rb") as spooled:
+            files = {
+                'file': (filename, spooled, 'application/octet-stream')
+            }
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(
-                    PINATA_PIN_JSON_URL,
-                    json={
-                        "pinataContent": metadata,
-                        "pinataMetadata": {
-                            "name": "NFT Ticket Metadata"
-                        }
-                    },
+                    PINATA_PIN_FILE_URL,
+                    files=files,
+                    data=data,
                     headers=self.headers
                 )
-                
-                if response.status_code == 200:
-                    ipfs_hash = response.json()['IpfsHash']
-                    return f"ipfs://{ipfs_hash}"
-                else:
-                    print(f"IPFS JSON upload error: {response.text}")
-                    raise Exception(f"IPFS JSON upload failed with status {response.status_code}")
-        except Exception as e:
-            print(f"IPFS JSON upload exception: {e}")
-            raise Exception(f"Failed to upload metadata to IPFS: {str(e)}")
+        
+        if response.status_code != 200:
+            raise Exception(f"IPFS upload failed with status {response.status_code}: {response.text}")
+        return response.json()['IpfsHash']
     
     def get_ipfs_url(self, ipfs_uri: str) -> str:
         if not ipfs_uri:
@@ -0,0 +1,251 @@
+"""
+Mint Order Service
+Runs ticket minting outside the HTTP request:
+- The request holds a seat, stores the order and returns at once
+- A pool of workers drives each order through its stages (metadata upload,
+  minting, saving), recording every stage on the order
+- Outputs are saved as each stage finishes, so an order interrupted by a
+  restart resumes where it stopped; one interrupted while minting is failed
+  instead, since retrying it could mint a second token
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+from repositories import orders as orders_repo
+from repositories import sales as sales_repo
+from repositories import tickets as tickets_repo
+from services.blockchain import blockchain_service
+from services.event_cache import event_cache
+from services.inventory import inventory_service
+from services.ipfs_service import ipfs_service
+from services.ticket_credential import qr_code_data
+
+# Load environment variables from .env file
+load_dotenv()
+
+MINT_WORKERS = int(os.getenv("MINT_WORKERS", "4"))
+# A running order untouched for this long is treated as abandoned by a crashed worker
+MINT_ORDER_STALE_SECONDS = int(os.getenv("MINT_ORDER_STALE_SECONDS", "300"))
+
+
+class MintFailed(Exception):
+    """Raised when a pipeline stage cannot complete"""
+
+
+class MintOrderService:
+    """
+    Order intake and the worker pool that mints them
+    """
+
+    def __init__(self, workers: int):
+        """
+        Initialize the service
+
+        Args:
+            workers: Orders minted at once per server process
+        """
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(
+        self,
+        event_id: str,
+        wallet_address: str,
+        reservation_id: str,
+        buyer_image_uri: str,
+        idempotency_key: Optional[str] = None
+    ) -> dict:
+        """
+        Store an order for seats already reserved and queue it for minting
+
+        Args:
+            event_id: Event to mint a ticket for
+            wallet_address: Buyer wallet
+            reservation_id: Seat reservation held for the order
+            buyer_image_uri: ipfs:// URI of the already uploaded buyer photo
+            idempotency_key: Client key identifying retries of the same purchase
+
+        Returns:
+            The stored order
+
+        Raises:
+            DuplicateKeyError: An order with this idempotency key already exists
+        """
+        now = datetime.utcnow()
+        order = {
+            "event_id": event_id,
+            "wallet_address": wallet_address.lower(),
+            "reservation_id": reservation_id,
+            "status": "queued",
+            "stage": "queued",
+            "history": [{"stage": "queued", "at": now}],
+            "buyer_image_uri": buyer_image_uri,
+            "created_at": now,
+            "updated_at": now
+        }
+        if idempotency_key:
+            order["idempotency_key"] = idempotency_key
+
+        result = await orders_repo.insert_order(order)
+        self.queue.put_nowait(result.inserted_id)
+        return order
+
+    async def _process(self, order_id: ObjectId):
+        order = await orders_repo.claim_order(order_id)
+        if not order:
+            return
+
+        event_id = order["event_id"]
+        event = await event_cache.get_event(event_id)
+
+        if order.get("token_id") is None:
+            # An order can wait in the queue past the reservation's TTL; if the
+            # sweeper has handed the seat to someone else, minting would oversell
+            if not await inventory_service.extend(event_id, order["reservation_id"]):
+                await self._fail(order_id, MintFailed("Seat reservation expired before minting"))
+                return
+            try:
+                async with inventory_service.held(event_id, order["reservation_id"]):
+                    await self._mint(order, event)
+            except Exception as e:
+                # No token exists, so the seat goes back on sale
+                await inventory_service.release(event_id, order["reservation_id"])
+                await self._fail(order_id, e)
+                return
+
+        if not order.get("seat_committed"):
+            # The token exists on chain from here on, so the seat is sold whatever happens next
+            committed = await inventory_service.commit(event_id, order["reservation_id"])
+            await orders_repo.update_order(order_id, {"seat_committed": True} if committed else {"seat_committed": True, "oversold": True})
+            if event:
+                await record_sale(event_id, order["wallet_address"], event.get("ticket_price", 0))
+
+        qr_data = qr_code_data(order["token_id"], event_id, order["metadata_uri"], order["buyer_image_uri"])
+        now = datetime.utcnow()
+        try:
+            await tickets_repo.insert_ticket({
+                "token_id": order["token_id"],
+                "event_id": event_id,
+                "owner_address": order["wallet_address"],
+                "metadata_uri": order["metadata_uri"],
+                "image_uri": order["buyer_image_uri"],
+                "qr_code_data": qr_data,
+                "tx_hash": order["tx_hash"],
+                "minted_at": now,
+                "updated_at": now
+            })
+        except DuplicateKeyError:
+            # Saved before an interruption
+            pass
+        except Exception as e:
+            await self._fail(order_id, e)
+            return
+
+        await orders_repo.set_stage(order_id, "completed", {"status": "completed", "qr_code_data": qr_data})
+
+    async def _mint(self, order: dict, event: Optional[dict]):
+        # Runs the stages that come before a token exists, skipping any whose
+        # output an interrupted earlier attempt already saved
+        order_id = order["_id"]
+        if not event:
+            raise MintFailed("Event not found")
+
+        if not order.get("metadata_uri"):
+            await orders_repo.set_stage(order_id, "uploading_metadata")
+            metadata = ticket_metadata(event, order["event_id"], order["wallet_address"], order["buyer_image_uri"])
+            metadata_uri = await ipfs_service.upload_json(metadata)
+            if not metadata_uri:
+                raise MintFailed("Failed to upload metadata")
+            order["metadata_uri"] = metadata_uri
+
+        await orders_repo.set_stage(order_id, "minting", {"metadata_uri": order["metadata_uri"]})
+        mint_result = await blockchain_service.mint_ticket(order["wallet_address"], order["metadata_uri"])
+        if not mint_result.get("success"):
+            raise MintFailed(f"Minting failed: {mint_result.get('error')}")
+
+        order["token_id"] = mint_result["token_id"]
+        order["tx_hash"] = mint_result["tx_hash"]
+        await orders_repo.set_stage(order_id, "saving", {"token_id": order["token_id"], "tx_hash": order["tx_hash"]})
+
+    async def _fail(self, order_id: ObjectId, error: Exception):
+        print(f"Mint order {order_id} failed: {error}")
+        await orders_repo.set_stage(order_id, "failed", {"status": "failed", "error": str(error)})
+
+    async def _work(self):
+        while True:
+            order_id = await self.queue.get()
+            try:
+                await self._process(order_id)
+            except Exception as e:
+                print(f"Mint worker error on order {order_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def recover(self):
+        """Queue orders left unfinished by a previous run"""
+        stale_before = datetime.utcnow() - timedelta(seconds=MINT_ORDER_STALE_SECONDS)
+        for order in await orders_repo.find_unfinished_orders():
+            if order["status"] == "running":
+                if order["updated_at"] > stale_before:
+                    # Probably still being worked on by another process
+                    continue
+                if order["stage"] == "minting":
+                    await self._fail(order["_id"], MintFailed("Interrupted while minting; not retried to avoid a double mint"))
+                    continue
+                if not await orders_repo.requeue_order(order["_id"], order["updated_at"]):
+                    continue
+            self.queue.put_nowait(order["_id"])
+
+    async def _recover_logged(self):
+        try:
+            await self.recover()
+        except Exception as e:
+            print(f"Could not recover mint orders: {e}")
+
+    def start(self):
+        """Start the worker pool and pick up unfinished orders"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._recover_logged()))
+
+    async def stop(self):
+        """Stop the workers; orders in progress are resumed by the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def ticket_metadata(event: dict, event_id: str, wallet_address: str, image_uri: str, price: Optional[float] = None) -> dict:
+    """NFT metadata for a ticket whose holder photo is at image_uri; price defaults to the event's"""
+    return {
+        "name": f"{event['title']} - Ticket",
+        "description": f"NFT Ticket for {event['title']} at {event['venue']}",
+        "image": image_uri,
+        "attributes": [
+            {"trait_type": "Event", "value": event["title"]},
+            {"trait_type": "Venue", "value": event["venue"]},
+            {"trait_type": "Date", "value": event["date"].isoformat()},
+            {"trait_type": "Price", "value": str(event["ticket_price"] if price is None else price)}
+        ],
+        "event_id": event_id,
+        "buyer_address": wallet_address.lower()
+    }
+
+
+async def record_sale(event_id: str, wallet_address: str, unit_price: float, quantity: int = 1):
+    """Add committed seats to the sales rollups; failures are logged, never raised"""
+    # The tickets are already minted; a rollup failure must not fail the sale
+    try:
+        await sales_repo.record_sale(event_id, wallet_address, quantity, unit_price * quantity, datetime.utcnow())
+    except Exception as e:
+        print(f"Could not record sale for event {event_id}: {e}")
+
+
+mint_order_service = MintOrderService(MINT_WORKERS)
@@ -0,0 +1,226 @@
+"""
+IPFS Pin Queue
+Pins uploaded content to IPFS in the background:
+- Content is streamed to a local spool directory, hashed on the way in, and
+  its CID recorded in MongoDB before the upload returns, so queued pins
+  survive restarts and no upload is ever held in memory whole
+- Workers pin due CIDs, retrying failures with exponential backoff
+- A pin claimed by a worker that died is claimed again after a lease expires
+- Spooled content is deleted once pinned, and only then is its sha256
+  recorded as stored, so content whose pin failed is queued again by the
+  next upload of it rather than deduplicated to a CID that never resolves
+"""
+
+import asyncio
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List, Optional, Union
+from dotenv import load_dotenv
+from repositories import content as content_repo
+from repositories import pins as pins_repo
+from services.cid import CIDBuilder, CHUNK_SIZE
+
+# Load environment variables from .env file
+load_dotenv()
+
+PIN_SPOOL_DIR = os.getenv("PIN_SPOOL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pin_spool"))
+PIN_WORKERS = int(os.getenv("PIN_WORKERS", "2"))
+PIN_MAX_ATTEMPTS = int(os.getenv("PIN_MAX_ATTEMPTS", "8"))
+PIN_RETRY_BASE_SECONDS = float(os.getenv("PIN_RETRY_BASE_SECONDS", "5"))
+PIN_POLL_SECONDS = float(os.getenv("PIN_POLL_SECONDS", "5"))
+PIN_LEASE_SECONDS = int(os.getenv("PIN_LEASE_SECONDS", "120"))
+
+Source = Union[bytes, BinaryIO, AsyncIterator[bytes]]
+
+
+class UploadTooLarge(Exception):
+    """Raised when streamed content exceeds the allowed size"""
+
+
+class StagedContent:
+    """
+    Content written to the spool under a temporary name, with its hashes
+    """
+
+    def __init__(self, path: str, sha256: str, cid: str, size: int):
+        self.path = path
+        self.sha256 = sha256
+        self.cid = cid
+        self.size = size
+
+    def discard(self):
+        """Delete the temporary file unless it was queued for pinning"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+async def _chunks(source: Source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE]
+    elif hasattr(source, "__aiter__"):
+        async for chunk in source:
+            yield chunk
+    else:
+        while chunk := await asyncio.to_thread(source.read, CHUNK_SIZE):
+            yield chunk
+
+
+class PinQueue:
+    """
+    Durable queue of content waiting to be pinned
+    """
+
+    def __init__(self, pin: Callable[[str, str], Awaitable[str]], spool_dir: str, workers: int):
+        """
+        Initialize the queue
+
+        Args:
+            pin: Coroutine function that pins a spooled file (path) under a file name and returns its CID
+            spool_dir: Directory holding content until it is pinned
+            workers: Pins uploaded at once
+        """
+        self.pin = pin
+        self.spool_dir = spool_dir
+        self.workers = workers
+        # Spooled content is only readable on this host, so pins are claimed per host
+        self.host = socket.gethostname()
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def _spool_path(self, cid: str) -> str:
+        return os.path.join(self.spool_dir, cid)
+
+    def _open_temp(self) -> tuple:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}.tmp")
+        return path, open(path, "wb")
+
+    @staticmethod
+    def _absorb(spool: BinaryIO, sha256, cid: CIDBuilder, chunk: bytes):
+        # Write and hash one chunk in a single thread hop
+        spool.write(chunk)
+        sha256.update(chunk)
+        cid.feed(chunk)
+
+    @staticmethod
+    def _seal(spool: BinaryIO):
+        spool.flush()
+        os.fsync(spool.fileno())
+        spool.close()
+
+    async def stage(self, source: Source, max_bytes: Optional[int] = None) -> StagedContent:
+        """
+        Stream content into the spool, hashing it on the way
+
+        Args:
+            source: Bytes, a binary file (such as a spooled upload) or an async byte iterator
+            max_bytes: Largest size accepted
+
+        Returns:
+            The staged content; call discard() on it when done
+
+        Raises:
+            UploadTooLarge: The content exceeds max_bytes
+        """
+        path, spool = await asyncio.to_thread(self._open_temp)
+        sha256 = hashlib.sha256()
+        cid = CIDBuilder()
+        size = 0
+        try:
+            async for chunk in _chunks(source):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                await asyncio.to_thread(self._absorb, spool, sha256, cid, chunk)
+            await asyncio.to_thread(self._seal, spool)
+        except BaseException:
+            spool.close()
+            os.remove(path)
+            raise
+        return StagedContent(path, sha256.hexdigest(), cid.finish(), size)
+
+    async def enqueue(self, staged: StagedContent, filename: str):
+        """
+        Durably queue staged content for pinning
+
+        Args:
+            staged: Content from stage(); its file moves into the spool
+            filename: Name to pin it under
+        """
+        path = self._spool_path(staged.cid)
+        await asyncio.to_thread(os.replace, staged.path, path)
+        staged.path = None
+        status = await pins_repo.enqueue_pin(staged.cid, staged.sha256, filename, staged.size, self.host)
+        if status == "pinned":
+            # Pinned while this copy was being staged; nothing left to upload
+            await asyncio.to_thread(os.remove, path)
+            return
+        self._wake.set()
+
+    async def _pin_one(self, pin: dict):
+        cid = pin["_id"]
+        path = self._spool_path(cid)
+        if not await asyncio.to_thread(os.path.exists, path):
+            # Already pinned by an earlier attempt that died before recording it,
+            # or the spool was lost; either way there is nothing left to upload
+            await pins_repo.mark_failed(cid, "Spooled content missing", None)
+            return
+
+        try:
+            pinned_cid = await self.pin(path, pin["filename"])
+        except Exception as e:
+            retry_at: Optional[datetime] = None
+            if pin["attempts"] < PIN_MAX_ATTEMPTS:
+                retry_at = datetime.utcnow() + timedelta(seconds=PIN_RETRY_BASE_SECONDS * 2 ** (pin["attempts"] - 1))
+            print(f"Pinning {cid} failed (attempt {pin['attempts']}): {e}")
+            await pins_repo.mark_failed(cid, str(e), retry_at)
+            return
+
+        if pinned_cid != cid:
+            # The URI handed out will not resolve; this means the pinning
+            # service chunks differently from services/cid.py. Retrying would
+            # give the same CID, so the pin fails (listed by GET /admin/pins)
+            # and the spooled content is kept to pin again once that is fixed
+            print(f"Error: {pin['filename']} pinned as {pinned_cid}, expected {cid}; {cid} will not resolve")
+            await pins_repo.mark_failed(cid, f"Pinned as {pinned_cid}, expected {cid}", None)
+            return
+
+        await pins_repo.mark_pinned(cid, pinned_cid)
+        if pin.get("sha256"):
+            await content_repo.record_cid(pin["sha256"], cid, pin["size"])
+        await asyncio.to_thread(os.remove, path)
+
+    async def _work(self):
+        lease = timedelta(seconds=PIN_LEASE_SECONDS)
+        while True:
+            try:
+                self._wake.clear()
+                pin = await pins_repo.claim_due_pin(self.host, lease)
+                if pin:
+                    await self._pin_one(pin)
+                    continue
+            except Exception as e:
+                print(f"Pin worker error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=PIN_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the pin workers; pins queued before a restart are picked up"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the pin workers; unfinished pins stay queued"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
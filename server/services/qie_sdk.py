@@ -3,19 +3,26 @@ QIE Blockchain SDK Wrapper
 This module provides QIE Blockchain SDK functionality for:
 - Wallet signature verification
 - Reading NFT ownership
-- Minting NFT tickets
+- Minting NFT tickets, singly or in batches
 """
 
 from web3 import Web3
+from web3.logs import DISCARD
 from eth_account.messages import encode_defunct
 import json
 import os
+import threading
 from dotenv import load_dotenv
-from typing import Optional, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, Dict, List
 
 # Load environment variables
 load_dotenv()
 
+# Contract reads issued at once when listing a wallet's tickets
+QIE_READ_CONCURRENCY = int(os.getenv("QIE_READ_CONCURRENCY", "8"))
+
 try:
     from web3.middleware import geth_poa_middleware
 except ImportError:
@@ -74,31 +81,26 @@ class QIEContract:
             address=self.contract_address,
             abi=self.abi
         )
+        self._send_lock = threading.Lock()
     
-    def mint(self, to_address: str, metadata_uri: str, private_key: str) -> Dict:
+    def _send_transaction(self, function_call, private_key: str, gas: int):
         """
-        Mint NFT ticket using QIE SDK
+        Sign and send a contract call, then wait for it to be mined
+        
+        Nonces are assigned under a lock so that concurrent sends from the same
+        account each get their own; only the receipt wait runs in parallel.
         
-        Args:
-            to_address: Recipient wallet address
-            metadata_uri: IPFS URI for ticket metadata
-            private_key: Organizer's private key for signing
-            
         Returns:
-            Transaction result with tx_hash and token_id
+            (tx_hash, transaction receipt)
         """
-        try:
-            account = self.qie_web3.w3.eth.account.from_key(private_key)
-            to_checksum = Web3.to_checksum_address(to_address)
-            
-            nonce = self.qie_web3.w3.eth.get_transaction_count(account.address)
+        account = self.qie_web3.w3.eth.account.from_key(private_key)
+        
+        with self._send_lock:
+            nonce = self.qie_web3.w3.eth.get_transaction_count(account.address, 'pending')
             
-            transaction = self.contract.functions.mint(
-                to_checksum,
-                metadata_uri
-            ).build_transaction({
+            transaction = function_call.build_transaction({
                 'chainId': self.qie_web3.chain_id,
-                'gas': 300000,
+                'gas': gas,
                 'gasPrice': self.qie_web3.w3.eth.gas_price,
                 'nonce': nonce,
             })
@@ -114,11 +116,38 @@ class QIEContract:
                 # Fallback: try accessing as bytes
                 raw_tx = bytes(signed_txn)
             tx_hash = self.qie_web3.w3.eth.send_raw_transaction(raw_tx)
+        
+        tx_receipt = self.qie_web3.w3.eth.wait_for_transaction_receipt(tx_hash)
+        return tx_hash, tx_receipt
+    
+    def mint(self, to_address: str, metadata_uri: str, private_key: str) -> Dict:
+        """
+        Mint NFT ticket using QIE SDK
+        
+        Args:
+            to_address: Recipient wallet address
+            metadata_uri: IPFS URI for ticket metadata
+            private_key: Organizer's private key for signing
+            
+        Returns:
+            Transaction result with tx_hash and token_id
+        """
+        try:
+            to_checksum = Web3.to_checksum_address(to_address)
             
-            tx_receipt = self.qie_web3.w3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_hash, tx_receipt = self._send_transaction(
+                self.contract.functions.mint(to_checksum, metadata_uri),
+                private_key,
+                300000
+            )
             
-            total_supply = self.contract.functions.totalSupply().call()
-            token_id = total_supply - 1
+            # Read the ID from the mint event; totalSupply() - 1 is only right
+            # when no other mint landed in the meantime
+            minted = self.contract.events.TicketMinted().process_receipt(tx_receipt, errors=DISCARD)
+            if minted:
+                token_id = minted[0]["args"]["tokenId"]
+            else:
+                token_id = self.contract.functions.totalSupply().call() - 1
             
             return {
                 "success": True,
@@ -132,6 +161,46 @@ class QIEContract:
                 "error": str(e)
             }
     
+    def mint_batch(self, to_addresses: List[str], metadata_uris: List[str], private_key: str) -> Dict:
+        """
+        Mint several NFT tickets in one transaction using QIE SDK
+        
+        Args:
+            to_addresses: Recipient wallet addresses
+            metadata_uris: IPFS URI for each ticket's metadata, paired by position
+            private_key: Organizer's private key for signing
+            
+        Returns:
+            Transaction result with tx_hash and token_ids (paired with to_addresses)
+        """
+        try:
+            account = self.qie_web3.w3.eth.account.from_key(private_key)
+            function_call = self.contract.functions.mintBatch(
+                [Web3.to_checksum_address(address) for address in to_addresses],
+                metadata_uris
+            )
+            # Batch cost grows with the number and length of URIs, so estimate
+            # it rather than using a fixed limit, with headroom
+            gas = int(function_call.estimate_gas({'from': account.address}) * 1.2)
+            
+            tx_hash, tx_receipt = self._send_transaction(function_call, private_key, gas)
+            if tx_receipt.get("status") == 0:
+                raise Exception(f"Transaction {tx_hash.hex()} reverted")
+            
+            minted = self.contract.events.TicketMinted().process_receipt(tx_receipt, errors=DISCARD)
+            
+            return {
+                "success": True,
+                "tx_hash": tx_hash.hex(),
+                "token_ids": [event["args"]["tokenId"] for event in minted],
+                "transaction_receipt": dict(tx_receipt)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
     def get_token_uri(self, token_id: int) -> str:
         """Get token URI for a specific token ID"""
         try:
@@ -157,6 +226,16 @@ class QIEContract:
             print(f"Error fetching balance: {e}")
             return 0
     
+    def token_of_owner_by_index(self, owner_address: str, index: int) -> int:
+        """
+        Get the index-th token of an owner (ERC721Enumerable)
+        
+        Raises:
+            Exception: The call failed, e.g. the contract has no owner index
+        """
+        checksum_address = Web3.to_checksum_address(owner_address)
+        return self.contract.functions.tokenOfOwnerByIndex(checksum_address, index).call()
+    
     def total_supply(self) -> int:
         """Get total supply of tokens"""
         try:
@@ -237,25 +316,44 @@ class QIENFT:
             if balance == 0:
                 return []
             
-            tickets = []
-            total_supply = self.contract.total_supply()
+            try:
+                # O(balance) reads through the contract's owner index
+                token_ids = self._read_all([
+                    partial(self.contract.token_of_owner_by_index, checksum_address, index)
+                    for index in range(balance)
+                ])
+            except Exception as e:
+                # Contracts deployed before the owner index was added
+                print(f"Owner index unavailable, scanning all tokens: {e}")
+                token_ids = self._scan_for_owner(checksum_address, balance)
             
-            for token_id in range(total_supply):
-                try:
-                    owner = self.contract.owner_of(token_id)
-                    if owner.lower() == checksum_address.lower():
-                        token_uri = self.contract.get_token_uri(token_id)
-                        tickets.append({
-                            "token_id": token_id,
-                            "token_uri": token_uri
-                        })
-                except:
-                    continue
+            token_uris = self._read_all([partial(self.contract.get_token_uri, token_id) for token_id in token_ids])
             
-            return tickets
+            return [
+                {"token_id": token_id, "token_uri": token_uri}
+                for token_id, token_uri in zip(token_ids, token_uris)
+            ]
         except Exception as e:
             print(f"Error fetching tickets: {e}")
             return []
+    
+    def _read_all(self, calls: List[Callable]) -> List:
+        # Contract reads are independent RPC round trips, so overlap them
+        if not calls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(QIE_READ_CONCURRENCY, len(calls))) as pool:
+            return list(pool.map(lambda call: call(), calls))
+    
+    def _scan_for_owner(self, checksum_address: str, balance: int) -> List[int]:
+        # O(totalSupply) fallback: check every token's owner, stopping once
+        # the owner's whole balance has been found
+        token_ids = []
+        for token_id in range(self.contract.total_supply()):
+            if self.contract.owner_of(token_id).lower() == checksum_address.lower():
+                token_ids.append(token_id)
+                if len(token_ids) == balance:
+                    break
+        return token_ids
 
 
 # QIE SDK Factory Functions
@@ -0,0 +1,272 @@
+"""
+Write-Behind Record Writer
+Takes records off the request path: they are queued in memory and written
+in batches once the batch is full or the flush interval passes, and on
+shutdown. With a spill file configured, queued records are also appended
+(off the event loop, fsynced) to a local JSON-lines file and replayed at
+startup, so a crashed worker does not lose them. Records get their _id when
+queued, so replaying a batch that was already written only hits duplicate
+keys, which are ignored.
+
+The queue is capped: while the database is unreachable, records past the
+cap are dropped and counted (GET /admin/writes) rather than growing memory
+without bound; scans are never held up waiting for it.
+
+Verification batches also feed the per-event check-in rollups; only records
+that were actually inserted are counted, so replays do not double count.
+Counting is a separate step from inserting and is retried on its own, so a
+failed rollup update never loses check-ins of records already inserted.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId, json_util
+from dotenv import load_dotenv
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+from repositories import verifications as verifications_repo
+from repositories import checkins as checkins_repo
+
+# Load environment variables from .env file
+load_dotenv()
+
+VERIFY_WRITE_BATCH_SIZE = int(os.getenv("VERIFY_WRITE_BATCH_SIZE", "100"))
+VERIFY_WRITE_FLUSH_SECONDS = float(os.getenv("VERIFY_WRITE_FLUSH_SECONDS", "1"))
+VERIFY_WRITE_CONCERN = os.getenv("VERIFY_WRITE_CONCERN", "1")  # "0" (unacknowledged), "1" or "majority"
+VERIFY_WRITE_SPILL_FILE = os.getenv("VERIFY_WRITE_SPILL_FILE", "")  # Optional crash-safe queue file
+VERIFY_WRITE_MAX_QUEUED = int(os.getenv("VERIFY_WRITE_MAX_QUEUED", "50000"))
+
+DUPLICATE_KEY = 11000
+
+
+def _write_concern(setting: str) -> WriteConcern:
+    return WriteConcern(w="majority" if setting == "majority" else int(setting))
+
+
+async def insert_verifications(records: List[dict], write_concern: WriteConcern) -> List[dict]:
+    """
+    Insert verification records
+
+    Returns:
+        The records newly inserted; ones already stored (replays) are left out
+
+    Raises:
+        BulkWriteError: A record failed for a reason other than being stored already
+    """
+    try:
+        await verifications_repo.insert_verifications(records, write_concern)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        return [record for index, record in enumerate(records) if index not in duplicates]
+    return records
+
+
+def _sync_to_disk(spill):
+    spill.flush()
+    os.fsync(spill.fileno())
+
+
+class BufferedWriter:
+    """
+    Batches records and writes them in the background
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[dict], WriteConcern], Awaitable[List[dict]]],
+        batch_size: int,
+        flush_interval: float,
+        write_concern: WriteConcern,
+        spill_path: Optional[str] = None,
+        max_queued: int = VERIFY_WRITE_MAX_QUEUED,
+        on_written: Optional[Callable[[List[dict]], Awaitable]] = None
+    ):
+        """
+        Initialize the writer
+
+        Args:
+            write: Coroutine function that stores a batch with the given write
+                concern and returns the records it newly stored
+            batch_size: Most records written at once; a full batch triggers a flush
+            flush_interval: Longest time (seconds) a record waits before being written
+            write_concern: Write concern passed to write
+            spill_path: Local file mirroring the queue, or None to keep it in memory only
+            max_queued: Most records held (each of the queue and the on_written
+                backlog); further ones are dropped and counted
+            on_written: Coroutine function run on the records write stored,
+                retried on later flushes until it succeeds
+        """
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_concern = write_concern
+        self.spill_path = spill_path
+        self.max_queued = max_queued
+        self.on_written = on_written
+        self.buffer: List[dict] = []
+        # Stored records whose on_written step has not succeeded yet (memory only)
+        self.written: List[dict] = []
+        self.dropped = 0
+        self.dropped_written = 0
+        # Queued records not yet appended to the spill file
+        self._unspilled: List[dict] = []
+        self._spill_due = asyncio.Event()
+        self._spill_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._lock = asyncio.Lock()
+
+    def add(self, record: dict):
+        """Queue a record; it is written within flush_interval seconds, or dropped if the queue is full"""
+        if len(self.buffer) >= self.max_queued:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"Warning: record queue full ({self.max_queued}); {self.dropped} record(s) dropped so far")
+            return
+        record.setdefault("_id", ObjectId())
+        self.buffer.append(record)
+        if self.spill_path:
+            self._unspilled.append(record)
+            self._spill_due.set()
+        if len(self.buffer) >= self.batch_size:
+            self._full.set()
+
+    def stats(self) -> Dict:
+        """Queue depth and records dropped since startup"""
+        return {
+            "queued": len(self.buffer),
+            "max_queued": self.max_queued,
+            "dropped": self.dropped,
+            "awaiting_rollup": len(self.written),
+            "dropped_rollup": self.dropped_written
+        }
+
+    async def flush(self):
+        """Write everything queued so far, one batch at a time"""
+        async with self._lock:
+            while self.buffer:
+                batch = self.buffer[:self.batch_size]
+                try:
+                    stored = await self.write(batch, self.write_concern)
+                except Exception as e:
+                    print(f"Record write failed, will retry: {e}")
+                    break
+                del self.buffer[:len(batch)]
+                await self._rewrite_spill()
+                self._follow_up(stored)
+            await self._run_on_written()
+
+    def _follow_up(self, stored: List[dict]):
+        if not self.on_written:
+            return
+        self.written.extend(stored)
+        overflow = len(self.written) - self.max_queued
+        if overflow > 0:
+            print(f"Warning: dropping follow-up of {overflow} stored record(s)")
+            self.dropped_written += overflow
+            del self.written[:overflow]
+
+    async def _run_on_written(self):
+        if not self.written:
+            return
+        try:
+            await self.on_written(self.written)
+        except Exception as e:
+            print(f"Record follow-up failed, will retry: {e}")
+            return
+        self.written = []
+
+    def _append_lines(self, records: List[dict]):
+        with open(self.spill_path, "a") as spill:
+            for record in records:
+                spill.write(json_util.dumps(record) + "\n")
+            _sync_to_disk(spill)
+
+    def _replace_lines(self, records: List[dict]):
+        temp_path = f"{self.spill_path}.tmp"
+        with open(temp_path, "w") as spill:
+            for record in records:
+                spill.write(json_util.dumps(record) + "\n")
+            _sync_to_disk(spill)
+        os.replace(temp_path, self.spill_path)
+
+    async def _spill(self):
+        async with self._spill_lock:
+            records, self._unspilled = self._unspilled, []
+            if records:
+                await asyncio.to_thread(self._append_lines, records)
+
+    async def _rewrite_spill(self):
+        if not self.spill_path:
+            return
+        async with self._spill_lock:
+            # Everything still queued goes into the new file, including
+            # records not appended yet
+            records = list(self.buffer)
+            self._unspilled = []
+            await asyncio.to_thread(self._replace_lines, records)
+
+    def _replay_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path) as spill:
+            for line in spill:
+                line = line.strip()
+                if line:
+                    self.buffer.append(json_util.loads(line))
+        if self.buffer:
+            print(f"Replaying {len(self.buffer)} queued record(s) from {self.spill_path}")
+
+    async def _spill_forever(self):
+        while True:
+            await self._spill_due.wait()
+            self._spill_due.clear()
+            try:
+                await self._spill()
+            except Exception as e:
+                print(f"Could not write record spill file: {e}")
+
+    async def _flush_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def start(self):
+        """Replay any spilled records and start background flushing"""
+        if not self._tasks:
+            self._replay_spill()
+            self._tasks = [asyncio.create_task(self._flush_forever())]
+            if self.spill_path:
+                self._tasks.append(asyncio.create_task(self._spill_forever()))
+
+    async def stop(self):
+        """Stop background flushing and write whatever is still queued"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.spill_path:
+            await self._spill()
+        await self.flush()
+        if self.buffer:
+            print(f"Warning: {len(self.buffer)} record(s) could not be written at shutdown")
+        if self.written:
+            print(f"Warning: follow-up of {len(self.written)} stored record(s) did not complete at shutdown")
+
+
+verification_writer = BufferedWriter(
+    insert_verifications,
+    VERIFY_WRITE_BATCH_SIZE,
+    VERIFY_WRITE_FLUSH_SECONDS,
+    _write_concern(VERIFY_WRITE_CONCERN),
+    VERIFY_WRITE_SPILL_FILE or None,
+    on_written=checkins_repo.increment_checkins
+)
@@ -0,0 +1,135 @@
+"""
+Ticket Redemptions
+One-time admission for each ticket:
+- A ticket is redeemed by a conditional update that only succeeds while it
+  has no redeemed_at, so two gates can never both admit the same ticket
+- Redeemed token IDs are also held in memory, so re-entry attempts are
+  rejected before any chain, IPFS or AI work
+- The in-memory set follows redemptions made by other workers through a
+  MongoDB change stream on the tickets collection, or by polling
+  redeemed_at where change streams are unavailable (as the event cache does).
+  It only speeds up rejections: a ticket missing from it is still refused
+  by the conditional update
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Set
+from dotenv import load_dotenv
+from database import tickets_collection
+from repositories import tickets as tickets_repo
+
+# Load environment variables from .env file
+load_dotenv()
+
+REDEMPTION_POLL_SECONDS = float(os.getenv("REDEMPTION_POLL_SECONDS", "2"))
+# Redemptions this recent are loaded at startup; older tickets belong to
+# past events and are refused by the database alone
+REDEMPTION_PRELOAD_HOURS = int(os.getenv("REDEMPTION_PRELOAD_HOURS", "168"))
+
+# Polls re-check this far behind the last poll so redemptions stamped by a
+# worker with a slightly slow clock are not missed
+POLL_OVERLAP = timedelta(seconds=5)
+
+
+class RedemptionService:
+    """
+    Redeems tickets and remembers which ones are used
+    """
+
+    def __init__(self):
+        self.redeemed: Set[int] = set()
+        self.mode = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    def is_redeemed(self, token_id: int) -> bool:
+        """True if the ticket is known to be used already (no I/O)"""
+        return token_id in self.redeemed
+
+    async def redeem(self, token_id: int, gate_id: str) -> Optional[str]:
+        """
+        Mark a ticket as used, exactly once
+
+        Args:
+            token_id: NFT token ID
+            gate_id: Gate admitting the holder
+
+        Returns:
+            None if this call redeemed the ticket, else "already_redeemed"
+            or "not_found"
+        """
+        outcome = await tickets_repo.redeem_ticket(token_id, gate_id, datetime.utcnow())
+        if outcome != "not_found":
+            self.redeemed.add(token_id)
+        return None if outcome == "redeemed" else outcome
+
+    async def _load_recent(self):
+        since = datetime.utcnow() - timedelta(hours=REDEMPTION_PRELOAD_HOURS)
+        self.redeemed.update(await tickets_repo.find_redeemed_token_ids(since))
+
+    async def _watch_change_stream(self):
+        pipeline = [{"$match": {
+            "operationType": "update",
+            "updateDescription.updatedFields.redeemed_at": {"$exists": True}
+        }}]
+        async with tickets_collection.watch(pipeline, full_document="updateLookup") as stream:
+            self.mode = "change_stream"
+            print("✓ Redemptions followed by change stream")
+            # Redemptions made before the stream opened
+            await self._load_recent()
+            async for change in stream:
+                document = change.get("fullDocument")
+                if document:
+                    self.redeemed.add(document["token_id"])
+
+    async def _poll_redemptions(self):
+        self.mode = "polling"
+        print(f"Polling for redemptions every {REDEMPTION_POLL_SECONDS}s (change streams unavailable)")
+        watermark = datetime.utcnow()
+        await self._load_recent()
+        while True:
+            await asyncio.sleep(REDEMPTION_POLL_SECONDS)
+            polled_at = datetime.utcnow()
+            try:
+                self.redeemed.update(await tickets_repo.find_redeemed_token_ids(watermark - POLL_OVERLAP))
+            except Exception as e:
+                print(f"Redemption poll error: {e}")
+                continue
+            watermark = polled_at
+
+    async def _run(self):
+        try:
+            await self._watch_change_stream()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Standalone servers reject change streams
+            print(f"Redemption change stream unavailable: {e}")
+        while True:
+            try:
+                await self._poll_redemptions()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Only the initial load can fail here; retry it
+                print(f"Could not load redemptions: {e}")
+                await asyncio.sleep(REDEMPTION_POLL_SECONDS)
+
+    def start(self):
+        """Start following redemptions in the background"""
+        if not self._watcher:
+            self._watcher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop following redemptions"""
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+redemption_service = RedemptionService()
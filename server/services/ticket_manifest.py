@@ -0,0 +1,85 @@
+"""
+Event Ticket Manifest
+Signed snapshot of an event's tickets for validators that check tickets
+without a connection:
+- Columnar CBOR: one array per field, owners packed into a single byte
+  string of 20-byte addresses, photo CIDs stored once and referenced by index
+- A delta (since=) holds only tickets changed after that time; validators
+  replace rows by token ID, so rows repeated across deltas are harmless
+- Signed with the ticket credential key, which validators fetch from
+  GET /verify/credential-key
+
+Layout: CBOR [payload, signature], payload = CBOR [
+    version, event_id, generated_at_ms, since_ms (0 for a full snapshot),
+    token_ids, owners, redeemed_at_s (0 = not redeemed), image_index, images
+]
+The signature is empty when credentials are disabled.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from services import cbor
+from services.ticket_credential import ticket_credentials, pack_image_uri
+
+MANIFEST_VERSION = 1
+
+# No photo recorded for the ticket (minted before tickets stored image_uri)
+NO_IMAGE = 0
+
+
+def _epoch(moment: Optional[datetime], scale: int) -> int:
+    if not moment:
+        return 0
+    return int(moment.replace(tzinfo=timezone.utc).timestamp() * scale)
+
+
+def _address(owner_address: str) -> bytes:
+    return bytes.fromhex(owner_address[2:] if owner_address.startswith("0x") else owner_address)
+
+
+def build_manifest(event_id: str, tickets: Iterable[dict], generated_at: datetime, since: Optional[datetime] = None) -> bytes:
+    """
+    Encode and sign a manifest
+
+    Args:
+        event_id: Event the tickets belong to
+        tickets: Ticket documents (token_id, owner_address, image_uri, redeemed_at)
+        generated_at: Time the tickets were read; the next delta's since
+        since: Start of the delta, None for a full snapshot
+
+    Returns:
+        CBOR bytes of [payload, signature]
+    """
+    token_ids = []
+    owners = bytearray()
+    redeemed_at = []
+    image_index = []
+    # Photo CID -> 1-based position in images; 0 means no photo
+    positions = {}
+    images = []
+    for ticket in tickets:
+        token_ids.append(ticket["token_id"])
+        owners += _address(ticket["owner_address"])
+        redeemed_at.append(_epoch(ticket.get("redeemed_at"), 1))
+        image_uri = ticket.get("image_uri")
+        if not image_uri:
+            image_index.append(NO_IMAGE)
+            continue
+        if image_uri not in positions:
+            images.append(pack_image_uri(image_uri))
+            positions[image_uri] = len(images)
+        image_index.append(positions[image_uri])
+
+    payload = cbor.encode([
+        MANIFEST_VERSION,
+        event_id,
+        _epoch(generated_at, 1000),
+        _epoch(since, 1000),
+        token_ids,
+        bytes(owners),
+        redeemed_at,
+        image_index,
+        images
+    ])
+    signature = ticket_credentials.sign(payload) if ticket_credentials.enabled else b""
+    return cbor.encode([payload, signature])
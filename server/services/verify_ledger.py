@@ -0,0 +1,108 @@
+"""
+Verification Ledger
+Keeps a rolling window of per-call AI verification metrics for each provider
+and summarizes them for capacity planning and provider comparison.
+"""
+
+import os
+from collections import deque
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+VERIFY_LEDGER_WINDOW = int(os.getenv("VERIFY_LEDGER_WINDOW", "500"))
+
+STAGES = ("metadata", "image", "provider", "total")
+
+
+def _percentile(values: List[int], fraction: float) -> Optional[int]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class VerificationLedger:
+    """
+    Rolling per-provider record of verification calls
+    """
+
+    def __init__(self, window: int):
+        """
+        Initialize the ledger
+
+        Args:
+            window: Number of most recent calls kept per provider
+        """
+        self.window = window
+        self.entries: Dict[str, deque] = {}
+
+    def record(self, metrics: dict, status: str):
+        """
+        Add one verification call
+
+        Args:
+            metrics: Metrics dict produced by AIVerifyService.verify_selfie
+            status: Verification status (verified, suspicious, denied, error)
+        """
+        self.entries.setdefault(metrics["provider"], deque(maxlen=self.window)).append((status, metrics))
+
+    def stats(self) -> Dict:
+        """
+        Summarize the window for every provider
+
+        Returns:
+            Per-provider call counts, status mix, stage latency percentiles (ms),
+            average payload size and token usage
+        """
+        providers = {}
+        for provider, entries in self.entries.items():
+            statuses: Dict[str, int] = {}
+            stage_times = {stage: [] for stage in STAGES}
+            payload_bytes = []
+            tokens_in = []
+            tokens_out = []
+            models = set()
+
+            for status, metrics in entries:
+                statuses[status] = statuses.get(status, 0) + 1
+                if metrics.get("model"):
+                    models.add(metrics["model"])
+                for stage in STAGES:
+                    if stage in metrics["ms"]:
+                        stage_times[stage].append(metrics["ms"][stage])
+                if metrics["bytes"]:
+                    payload_bytes.append(sum(metrics["bytes"].values()))
+                tokens = metrics.get("tokens") or {}
+                if tokens.get("in") is not None:
+                    tokens_in.append(tokens["in"])
+                if tokens.get("out") is not None:
+                    tokens_out.append(tokens["out"])
+
+            providers[provider] = {
+                "calls": len(entries),
+                "models": sorted(models),
+                "statuses": statuses,
+                "latency_ms": {
+                    stage: {
+                        "p50": _percentile(times, 0.5),
+                        "p95": _percentile(times, 0.95),
+                        "max": max(times) if times else None
+                    }
+                    for stage, times in stage_times.items()
+                },
+                "avg_payload_bytes": round(sum(payload_bytes) / len(payload_bytes)) if payload_bytes else None,
+                "tokens": {
+                    "input_total": sum(tokens_in),
+                    "output_total": sum(tokens_out),
+                    "input_avg": round(sum(tokens_in) / len(tokens_in)) if tokens_in else None,
+                    "output_avg": round(sum(tokens_out) / len(tokens_out)) if tokens_out else None
+                }
+            }
+
+        return {"window": self.window, "providers": providers}
+
+
+verification_ledger = VerificationLedger(VERIFY_LEDGER_WINDOW)